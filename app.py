@@ -1,36 +1,63 @@
-from utility.script.script_generator import generate_script, extract_text_for_tts
-from utility.audio.audio_generator import generate_audio
-from utility.captions.timed_captions_generator import generate_timed_captions
+from utility.script.script_generator import generate_script
+from utility.audio.audio_generator import generate_audio_parts
+from utility.captions.duration_timing import timed_captions_from_parts
 from utility.video.background_video_generator import generate_video_url
-from utility.render.render_engine import get_output_media
+from utility.render.render_engine import get_output_media, RENDER_BACKENDS, RENDER_PROFILES
 from utility.video.video_search_query_generator import getVideoSearchQueriesTimed, merge_empty_intervals
 import argparse
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a video from a topic.")
     parser.add_argument("topic", type=str, help="The topic for the video")
+    parser.add_argument("--preview", action="store_true",
+                        help="Fast low-resolution render with the same cuts and caption timing")
+    parser.add_argument("--timing", choices=["tts", "align", "transcribe"], default="tts",
+                        help="Caption timing (default: tts). tts = per-part TTS durations, no Whisper; "
+                             "align = Whisper forced alignment to the script; transcribe = Whisper "
+                             "transcription, the previous default")
+    parser.add_argument("--backend", choices=RENDER_BACKENDS, default="moviepy",
+                        help="Compositor: MoviePy frames in Python, or one ffmpeg filtergraph")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Render segments on several processes and reuse unchanged ones "
+                             "from the segment cache on re-render")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for --parallel (default: all cores)")
+    parser.add_argument("--no-incremental", dest="incremental", action="store_false",
+                        help="With --parallel, re-encode every segment instead of reusing cached ones "
+                             "(no effect without --parallel)")
     args = parser.parse_args()
+    render_profile = RENDER_PROFILES["preview" if args.preview else "final"]
 
     SAMPLE_TOPIC = args.topic
     SAMPLE_FILE_NAME = "audio_tts.mp3"
     VIDEO_SERVER = "pexel"
+    WHISPER_MODEL_SIZE = "medium"
+
+    if args.timing != "tts":
+        # chỉ import/load Whisper khi thật sự cần
+        from utility.captions.timed_captions_generator import generate_timed_captions
+        from utility.captions.model_registry import preload_models
+
+        # Load Whisper trong nền, song song với tạo script + TTS
+        preload_models([WHISPER_MODEL_SIZE], background=True)
 
     # 1. Generate clean script text
     script_text = generate_script(SAMPLE_TOPIC)
     print("script:", script_text)
 
     # 2. Generate TTS audio safely
-    # Lấy toàn bộ text từ script JSON
-    text_for_tts = extract_text_for_tts(script_text)
-    print(text_for_tts)
-    # Gọi hàm tạo audio với chuỗi text
-    generate_audio(text_for_tts, SAMPLE_FILE_NAME)
-    # 3. Generate whisper timestamps
-    timed_captions = generate_timed_captions(
-      audio_filename=SAMPLE_FILE_NAME,
-      script_json=script_text,   # đổi tên tham số
-      model_size="medium"
-    )
+    # Tạo audio từng phần song song rồi nối lại (mốc thời gian từng phần trả về)
+    tts_parts = generate_audio_parts(script_text, SAMPLE_FILE_NAME)
+    # 3. Generate caption timestamps
+    if args.timing == "tts":
+        # thời lượng từng phần TTS đã biết → không cần Whisper
+        timed_captions = timed_captions_from_parts(tts_parts)
+    else:
+        timed_captions = generate_timed_captions(
+          audio_filename=SAMPLE_FILE_NAME,
+          script_json=script_text,   # đổi tên tham số
+          model_size=WHISPER_MODEL_SIZE,
+          mode=args.timing           # "align": script đã biết → chỉ căn thời gian
+        )
 
     print(timed_captions)
 
@@ -39,7 +66,9 @@ if __name__ == "__main__":
     print(search_terms)
     # 5. Get background videos
     if search_terms:
-        background_video_urls = generate_video_url(search_terms)
+        background_video_urls = generate_video_url(
+            search_terms, max_height=render_profile["max_asset_height"]
+        )
         print(background_video_urls)
     else:
         print("No background video")
@@ -50,7 +79,11 @@ if __name__ == "__main__":
 
     # 7. Final video rendering
     if background_video_urls:
-        video = get_output_media(SAMPLE_FILE_NAME, timed_captions, background_video_urls, VIDEO_SERVER)
+        video = get_output_media(
+            SAMPLE_FILE_NAME, timed_captions, background_video_urls, VIDEO_SERVER,
+            backend=args.backend, parallel=args.parallel, workers=args.workers,
+            incremental=args.incremental, preview=args.preview
+        )
         print(video)
     else:
         print("No video")
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from moviepy.audio.AudioClip import AudioArrayClip
+from utility import disk_cache
+from utility.render.ffmpeg_utils import decoded_duration, run_ffmpeg
+
+# =======================
+# CẤU HÌNH PCM CACHE
+# =======================
+PCM_NAMESPACE = "pcm"
+PCM_VERSION = 1
+PCM_CACHE_MAX_BYTES = int(os.environ.get("PCM_CACHE_MAX_BYTES", 1024 ** 3))
+
+# (sample_rate, channels) của từng nơi dùng
+WHISPER_PCM = (16000, 1)     # Whisper / căn thời gian / phân tích khoảng lặng
+MIX_PCM = (44100, 2)         # mux vào video (MoviePy + ffmpeg)
+
+_hash_memo = {}              # (abspath, size, mtime_ns) → sha256
+_memo_lock = threading.Lock()
+
+
+# =======================
+# KEY
+# =======================
+def content_hash(path):
+    """sha256 of the encoded file, memoized per (path, size, mtime) in-process."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _memo_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    with _memo_lock:
+        _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+# =======================
+# DECODE ONCE → MEMMAP
+# =======================
+def pcm_key(path, sample_rate, channels):
+    return disk_cache.make_key("pcm", PCM_VERSION, content_hash(path), sample_rate, channels)
+
+
+def pcm_path(path, sample_rate, channels):
+    """
+    Path of the raw float32 little-endian PCM for this audio file and format,
+    decoding it with one ffmpeg call on the first request only.
+    """
+    key = pcm_key(path, sample_rate, channels)
+    cached = disk_cache.lookup(PCM_NAMESPACE, key, ".f32")
+    if cached:
+        return cached
+    with disk_cache.key_lock(PCM_NAMESPACE, key):
+        cached = disk_cache.lookup(PCM_NAMESPACE, key, ".f32", count=False)
+        if cached:
+            return cached
+        with disk_cache.atomic_write(PCM_NAMESPACE, key, ".f32", PCM_CACHE_MAX_BYTES) as tmp_path:
+            run_ffmpeg([
+                "-i", path, "-vn",
+                "-ac", channels, "-ar", sample_rate,
+                "-f", "f32le", "-acodec", "pcm_f32le", tmp_path,
+            ])
+    return disk_cache.cache_path(PCM_NAMESPACE, key, ".f32")
+
+
+def load_pcm(path, sample_rate, channels):
+    """
+    Decoded samples as a float32 memmap: shape (n,) for mono, (n, channels)
+    otherwise. Copy-on-write, so consumers may treat it as a normal writable
+    array (torch.from_numpy) without touching the cache file; pages are
+    shared between processes until written.
+    """
+    samples = np.memmap(pcm_path(path, sample_rate, channels), dtype="<f4", mode="c")
+    return samples if channels == 1 else samples.reshape(-1, channels)
+
+
+def whisper_audio(path):
+    """16 kHz mono float32, what whisper.audio.load_audio(path) would decode."""
+    return load_pcm(path, *WHISPER_PCM)
+
+
+def mix_audio(path):
+    return load_pcm(path, *MIX_PCM)
+
+
+def pcm_seconds(pcm_file, sample_rate, channels):
+    return os.path.getsize(pcm_file) / (4 * channels * sample_rate)
+
+
+def audio_duration(path, pcm=None):
+    """
+    Exact decoded length in seconds. pcm=(sample_rate, channels) is the
+    variant the caller is about to read anyway (MIX_PCM for rendering): the
+    length comes from that cache entry. Without it an already cached variant
+    is used, else a decode to a pipe that leaves nothing in the PCM cache.
+    """
+    if pcm is not None:
+        return pcm_seconds(pcm_path(path, *pcm), *pcm)
+    for sample_rate, channels in (MIX_PCM, WHISPER_PCM):
+        cached = disk_cache.lookup(PCM_NAMESPACE, pcm_key(path, sample_rate, channels), ".f32", count=False)
+        if cached:
+            return pcm_seconds(cached, sample_rate, channels)
+    return decoded_duration(path)
+
+
+# =======================
+# CONSUMERS
+# =======================
+def narration_clip(path):
+    """MoviePy audio clip reading the cached 44.1 kHz PCM instead of decoding the file again."""
+    samples = mix_audio(path)
+    # AudioArrayClip only sets duration; CompositeAudioClip needs end too
+    return AudioArrayClip(samples, fps=MIX_PCM[0]).set_duration(len(samples) / MIX_PCM[0])
+
+
+def ffmpeg_audio_input(path):
+    """ffmpeg input args reading the cached 44.1 kHz PCM (no mp3 decode in the encoder)."""
+    sample_rate, channels = MIX_PCM
+    return ["-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", pcm_path(path, *MIX_PCM)]
@@ -1,12 +1,20 @@
-import requests
+import os
+import shutil
 import time
 import json # Import thư viện json để xử lý dữ liệu từ Gemini
+from utility.audio.audio_asset import audio_duration
+from utility.audio.tts_backends import TTS_CONCURRENCY, get_tts_backend, synthesize_all
+from utility.audio.tts_cache import cached_tts_path, get_tts_cache_stats, lookup_tts_path, store_tts
+from utility.render.ffmpeg_utils import run_ffmpeg
 
 # =======================
-# CẤU HÌNH FPT AI
+# CẤU HÌNH TTS
 # =======================
-API_KEY = "7zE1Fuq1p0bKESXNy3WFwIGWsQWQF23I"  # API key FPT AI của bạn
-VOICE = "banmai"                             # giọng đọc
+# URL / API key / giọng đọc nằm ở backend (utility/audio/tts_backends.py)
+TTS_PART_DEADLINE = float(os.environ.get("TTS_PART_DEADLINE", 60))    # mỗi phần
+TTS_DEADLINE = float(os.environ.get("TTS_DEADLINE", 180))             # cả script
+PART_SILENCE = float(os.environ.get("TTS_PART_SILENCE", 0.3))         # giây giữa các phần
+OUTPUT_SAMPLE_RATE = 44100
 
 # =======================
 # HÀM NỐI TEXT TỪ JSON
@@ -30,70 +38,117 @@ def extract_text_for_tts(script_data: dict) -> str:
     return all_text.strip()
 
 
+def extract_tts_parts(script_data: dict) -> list:
+    """Từng đoạn script_parts + call_to_action, mỗi đoạn là một request TTS."""
+    parts = [
+        part.get("text", "").strip()
+        for part in script_data.get("script_parts", [])
+        if part.get("text", "").strip()
+    ]
+    call_to_action = script_data.get("call_to_action", "").strip()
+    if call_to_action:
+        parts.append(call_to_action)
+    return parts
+
+
+# =======================
+# SYNTHESIZE (QUA BACKEND + CACHE)
+# =======================
+def synthesize(text: str, deadline: float = None, backend=None) -> bytes:
+    """Text → bytes audio (blocking) trong giới hạn deadline."""
+    backend = backend or get_tts_backend()
+    deadline = deadline or time.monotonic() + TTS_PART_DEADLINE
+    return backend.synthesize(text, deadline)
+
+
+def synthesize_cached(text: str, deadline: float = None, backend=None) -> str:
+    """
+    Đường dẫn audio đã cache cho text (theo text chuẩn hoá + giọng + endpoint);
+    cache hit bỏ qua cả POST lẫn vòng poll.
+    """
+    backend = backend or get_tts_backend()
+    return cached_tts_path(text, *backend.cache_id(), lambda t: synthesize(t, deadline, backend))
+
+
 # =======================
 # HÀM TẠO AUDIO (TTS)
 # =======================
-def generate_audio(text: str, outputFilename: str):
+def generate_audio(text: str, outputFilename: str, backend=None):
     """
-    Gửi request đến FPT AI TTS và tải về file audio.
+    Gửi request đến dịch vụ TTS (mặc định FPT AI) và tải về file audio.
     """
     if not text:
         print("Cảnh báo: Không có nội dung text để tạo audio.")
         return
 
-    url = "https://api.fpt.ai/hmi/tts/v5"
+    print(f"Bắt đầu tạo audio (dài {len(text)} ký tự)...")
+    started = time.monotonic()
+    audio_path = synthesize_cached(text, started + TTS_DEADLINE, backend)
+    print(f"✅ Audio sẵn sàng sau {time.monotonic() - started:.1f}s")
 
-    headers = {
-        "api_key": API_KEY,
-        "voice": VOICE,
-        "Cache-Control": "no-cache"
-    }
+    shutil.copyfile(audio_path, outputFilename)
 
-    # 1. Gửi request tạo audio
-    print(f"Bắt đầu tạo audio (dài {len(text)} ký tự)...")
-    try:
-        response = requests.post(
-            url,
-            headers=headers,
-            data=text.encode("utf-8")
-        )
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Lỗi kết nối FPT TTS: {e}")
-
-    if response.status_code != 200:
-        raise Exception(f"TTS request failed (Mã {response.status_code}): {response.text}")
-
-    # FPT trả về link file audio
-    result = response.json()
-    audio_url = result.get("async")
-    
-    if not audio_url:
-        raise Exception("Không nhận được link audio từ FPT")
-        
-    print(f"Link audio tạm thời: {audio_url}")
-
-    # 2. Tải về file audio
-    download_headers = {
-        "User-Agent": "Mozilla/5.0"
-    }
-
-    # Retry tối đa 10 lần (~10–15 giây)
-    audio_data = None
-    max_retries = 10
-    for i in range(max_retries):
-        r = requests.get(audio_url, headers=download_headers)
-        if r.status_code == 200:
-            audio_data = r.content
-            print(f"✅ Audio sẵn sàng sau {i+1} lần thử")
-            break
-        elif i < max_retries - 1:
-            print(f"Chưa xong (Mã {r.status_code}), chờ thêm 1.5 giây...")
-            time.sleep(1.5)
-
-    if audio_data is None:
-        raise Exception(f"Audio chưa sẵn sàng sau {max_retries} lần thử")
-
-    with open(outputFilename, "wb") as f:
-        f.write(audio_data)
-
-    print(f"✅ Đã lưu audio thành công: {outputFilename}")
\ No newline at end of file
+    print(f"✅ Đã lưu audio thành công: {outputFilename}")
+
+
+# =======================
+# TTS THEO TỪNG PHẦN (SONG SONG)
+# =======================
+def concat_audio_parts(part_files, outputFilename, silence=PART_SILENCE):
+    """Nối các file audio theo thứ tự, chèn `silence` giây im lặng giữa các phần."""
+    layout = f"aresample={OUTPUT_SAMPLE_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo"
+    inputs, chains, labels = [], [], []
+    for i, path in enumerate(part_files):
+        inputs += ["-i", path]
+        chains.append(f"[{i}:a]{layout}[a{i}]")
+        labels.append(f"[a{i}]")
+        if silence > 0 and i < len(part_files) - 1:
+            chains.append(f"anullsrc=r={OUTPUT_SAMPLE_RATE}:cl=stereo,atrim=duration={silence}[s{i}]")
+            labels.append(f"[s{i}]")
+    graph = ";".join(chains) + f";{''.join(labels)}concat=n={len(labels)}:v=0:a=1[out]"
+    run_ffmpeg(inputs + ["-filter_complex", graph, "-map", "[out]", "-c:a", "libmp3lame", "-q:a", "2", outputFilename])
+
+
+def generate_audio_parts(script_data: dict, outputFilename: str, silence: float = PART_SILENCE,
+                         concurrency: int = TTS_CONCURRENCY, backend=None) -> list:
+    """
+    Tạo audio cho từng phần của script (script_parts + call_to_action) song
+    song (asyncio client, tối đa `concurrency` job), rồi nối lại thành
+    outputFilename. Thời gian chờ ≈ phần dài nhất thay vì tổng các phần.
+
+    Returns:
+        list: [{"text", "start", "end", "duration"}, ...] theo thứ tự, mốc
+        thời gian tính trong file đã nối (đã gồm khoảng lặng).
+    """
+    parts = extract_tts_parts(script_data)
+    if not parts:
+        print("Cảnh báo: Không có nội dung text để tạo audio.")
+        return []
+
+    backend = backend or get_tts_backend()
+    voice, endpoint = backend.cache_id()
+    started = time.monotonic()
+
+    # phần nào không đổi (kể cả call_to_action dùng chung) lấy thẳng từ cache
+    part_files = [lookup_tts_path(text, voice, endpoint) for text in parts]
+    missing = list(dict.fromkeys(text for text, path in zip(parts, part_files) if not path))
+    print(f"Bắt đầu tạo audio: {len(parts)} phần, {len(missing)} cần tổng hợp ({backend.name})...")
+
+    if missing:
+        audio = synthesize_all(backend, missing, started + TTS_DEADLINE, TTS_PART_DEADLINE, concurrency)
+        stored = {text: store_tts(text, voice, endpoint, data) for text, data in zip(missing, audio)}
+        part_files = [path or stored[text] for text, path in zip(parts, part_files)]
+    print(f"✅ {len(parts)} phần audio sẵn sàng sau {time.monotonic() - started:.1f}s "
+          f"(TTS cache: {get_tts_cache_stats()})")
+
+    durations = [audio_duration(path) for path in part_files]
+    concat_audio_parts(part_files, outputFilename, silence)
+
+    timings, t = [], 0.0
+    for text, duration in zip(parts, durations):
+        timings.append({"text": text, "start": round(t, 3), "end": round(t + duration, 3),
+                        "duration": round(duration, 3)})
+        t += duration + silence
+
+    print(f"✅ Đã lưu audio thành công: {outputFilename}")
+    return timings
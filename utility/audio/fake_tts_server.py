@@ -0,0 +1,191 @@
+"""
+Local stand-in for the FPT TTS API, for load tests and polling tuning offline.
+
+    python -m utility.audio.fake_tts_server --port 8089 --latency 1 4 --fail-rate 0.05
+    FPT_TTS_URL=http://127.0.0.1:8089/hmi/tts/v5 python app.py "..."
+
+    python -m utility.audio.fake_tts_server --load-test 50 --concurrency 16
+
+Same flow as FPT: POST text to /hmi/tts/v5 → {"error": 0, "async": <url>};
+GET <url> answers 404 until the job's latency has passed, then an mp3 of
+silence whose length follows the text. Failures are injected on purpose:
+500 on POST (fail_rate), 429 above max_pending jobs in flight, and jobs
+that never become ready (lost_rate).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utility.audio.tts_backends import FPTBackend, synthesize_all
+from utility.render.ffmpeg_utils import run_ffmpeg
+
+SECONDS_PER_CHAR = 0.07      # ~ tốc độ đọc của giọng banmai
+
+
+# =======================
+# AUDIO GIẢ
+# =======================
+_silence_cache = {}
+_silence_lock = threading.Lock()
+
+
+def silent_mp3(seconds):
+    """mp3 im lặng dài `seconds` (làm tròn 0.1 s), tạo bằng ffmpeg một lần cho mỗi độ dài."""
+    seconds = max(0.1, round(seconds, 1))
+    with _silence_lock:
+        data = _silence_cache.get(seconds)
+        if data is None:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "silence.mp3")
+                run_ffmpeg(["-f", "lavfi", "-i", "anullsrc=r=22050:cl=mono", "-t", seconds,
+                            "-c:a", "libmp3lame", "-q:a", "9", path])
+                with open(path, "rb") as f:
+                    data = _silence_cache[seconds] = f.read()
+    return data
+
+
+# =======================
+# SERVER
+# =======================
+class FakeTTSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=(0.5, 2.0), fail_rate=0.0, lost_rate=0.0,
+                 max_pending=None, seed=None):
+        super().__init__(address, FakeTTSHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.lost_rate = lost_rate
+        self.max_pending = max_pending
+        self.random = random.Random(seed)
+        self.jobs = {}               # id → (ready_at | None, seconds)
+        self.lock = threading.Lock()
+        self.stats = {"posts": 0, "polls": 0, "ready": 0, "rate_limited": 0, "failed": 0, "lost": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def pending(self, now):
+        return sum(1 for ready_at, _ in self.jobs.values() if ready_at is None or ready_at > now)
+
+
+class FakeTTSHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        text = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        now = time.monotonic()
+        with server.lock:
+            server.stats["posts"] += 1
+            if server.max_pending and server.pending(now) >= server.max_pending:
+                server.stats["rate_limited"] += 1
+                return self.send_json(429, {"error": 1, "message": "too many requests"})
+            if server.random.random() < server.fail_rate:
+                server.stats["failed"] += 1
+                return self.send_json(500, {"error": 1, "message": "injected failure"})
+            job_id = uuid.uuid4().hex
+            lost = server.random.random() < server.lost_rate
+            server.stats["lost"] += lost
+            ready_at = None if lost else now + server.random.uniform(*server.latency)
+            server.jobs[job_id] = (ready_at, len(text) * SECONDS_PER_CHAR)
+
+        self.send_json(200, {
+            "error": 0,
+            "async": f"{server.base_url}/audio/{job_id}.mp3",
+            "request_id": job_id,
+            "message": "The content will be returned after a few seconds under the async link.",
+        })
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/stats":
+            with server.lock:
+                return self.send_json(200, dict(server.stats, pending=server.pending(time.monotonic())))
+
+        job_id = os.path.basename(self.path).split(".")[0]
+        with server.lock:
+            server.stats["polls"] += 1
+            job = server.jobs.get(job_id)
+        if job is None or job[0] is None or job[0] > time.monotonic():
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        data = silent_mp3(job[1])
+        with server.lock:
+            server.stats["ready"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_tts_server(host="127.0.0.1", port=0, **options):
+    """Run the fake server in a daemon thread; returns it (server.base_url, server.shutdown())."""
+    server = FakeTTSServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-tts", daemon=True).start()
+    return server
+
+
+# =======================
+# LOAD TEST
+# =======================
+def load_test(n_jobs, concurrency, deadline=60.0, **options):
+    """n_jobs syntheses through the async client against a local fake server."""
+    server = start_fake_tts_server(**options)
+    backend = FPTBackend(url=f"{server.base_url}/hmi/tts/v5")
+    texts = [f"Câu thử số {i} " * server.random.randint(1, 6) for i in range(n_jobs)]
+    started = time.monotonic()
+    try:
+        audio = synthesize_all(backend, texts, started + deadline, deadline, concurrency)
+        outcome = f"{len(audio)} ok"
+    except Exception as e:
+        outcome = f"failed: {e}"
+    elapsed = time.monotonic() - started
+    print(f"{n_jobs} jobs, concurrency {concurrency}: {outcome} in {elapsed:.2f}s")
+    print(f"server: {server.stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake FPT-compatible TTS server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.5, 2.0), metavar=("MIN", "MAX"),
+                        help="seconds until a job's audio is ready")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of POSTs answered with 500")
+    parser.add_argument("--lost-rate", type=float, default=0.0, help="share of jobs never ready")
+    parser.add_argument("--max-pending", type=int, default=None, help="429 above this many jobs in flight")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--load-test", type=int, default=None, metavar="N_JOBS",
+                        help="run N_JOBS through the async client instead of serving")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    options = dict(latency=tuple(args.latency), fail_rate=args.fail_rate, lost_rate=args.lost_rate,
+                   max_pending=args.max_pending, seed=args.seed)
+    if args.load_test:
+        load_test(args.load_test, args.concurrency, host=args.host, port=0, **options)
+    else:
+        server = FakeTTSServer((args.host, args.port), **options)
+        print(f"Fake TTS server on {server.base_url}/hmi/tts/v5")
+        server.serve_forever()
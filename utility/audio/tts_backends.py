@@ -0,0 +1,214 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import time
+import aiohttp
+import requests
+
+# =======================
+# CẤU HÌNH BACKEND
+# =======================
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "fpt")
+FPT_API_KEY = os.environ.get("FPT_API_KEY", "7zE1Fuq1p0bKESXNy3WFwIGWsQWQF23I")
+FPT_VOICE = os.environ.get("FPT_VOICE", "banmai")                       # giọng đọc
+FPT_TTS_URL = os.environ.get("FPT_TTS_URL", "https://api.fpt.ai/hmi/tts/v5")
+
+# Poll link async: chờ tăng dần thay vì cố định 1.5 s × 10 lần
+POLL_INITIAL = 0.5                           # giây
+POLL_BACKOFF = 1.6
+POLL_MAX_INTERVAL = 4.0
+REQUEST_TIMEOUT = 30                         # giây cho mỗi HTTP request
+TTS_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", 8))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def next_delay(delay):
+    return min(delay * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+
+# =======================
+# INTERFACE
+# =======================
+class TTSBackend(ABC):
+    """
+    Một dịch vụ TTS. synthesize() (blocking) và synthesize_async() (aiohttp)
+    đều trả về bytes audio hoặc raise Exception khi quá `deadline`
+    (time.monotonic()). Backend thiếu method nào sẽ lỗi ngay khi khởi tạo.
+    """
+    name = None
+
+    @abstractmethod
+    def cache_id(self):
+        """(voice, endpoint) dùng trong key của TTS cache."""
+
+    @abstractmethod
+    def synthesize(self, text, deadline):
+        """Bytes audio cho text (blocking)."""
+
+    @abstractmethod
+    async def synthesize_async(self, session, text, deadline):
+        """Bytes audio cho text qua aiohttp session."""
+
+
+# =======================
+# FPT AI (POST → link async → poll)
+# =======================
+class FPTBackend(TTSBackend):
+    name = "fpt"
+
+    def __init__(self, api_key=None, voice=None, url=None):
+        self.api_key = api_key or FPT_API_KEY
+        self.voice = voice or FPT_VOICE
+        self.url = url or FPT_TTS_URL
+
+    def cache_id(self):
+        return self.voice, self.url
+
+    def headers(self):
+        return {
+            "api_key": self.api_key,
+            "voice": self.voice,
+            "Cache-Control": "no-cache"
+        }
+
+    # ---------- blocking (requests) ----------
+    def request(self, text, deadline):
+        """Gửi text, trả về link audio async; 429/5xx thử lại với backoff đến deadline."""
+        delay = POLL_INITIAL
+        while True:
+            timeout = max(1.0, min(REQUEST_TIMEOUT, deadline - time.monotonic()))
+            try:
+                response = requests.post(self.url, headers=self.headers(), data=text.encode("utf-8"),
+                                         timeout=timeout)
+                status, body = response.status_code, response.text
+            except requests.exceptions.RequestException as e:
+                status, body = None, str(e)
+
+            if status == 200:
+                break
+            if (status is None or status in RETRY_STATUS) and time.monotonic() + delay < deadline:
+                time.sleep(delay)
+                delay = next_delay(delay)
+                continue
+            if status is None:
+                raise Exception(f"Lỗi kết nối FPT TTS: {body}")
+            raise Exception(f"TTS request failed (Mã {status}): {body}")
+
+        audio_url = response.json().get("async")
+        if not audio_url:
+            raise Exception("Không nhận được link audio từ FPT")
+        return audio_url
+
+    def poll(self, audio_url, deadline):
+        """Chờ file audio async sẵn sàng: khoảng chờ tăng dần (0.5 s → 4 s) đến deadline."""
+        delay, attempt = POLL_INITIAL, 0
+        while True:
+            attempt += 1
+            timeout = max(1.0, min(REQUEST_TIMEOUT, deadline - time.monotonic()))
+            try:
+                r = requests.get(audio_url, headers={"User-Agent": "Mozilla/5.0"}, timeout=timeout)
+                if r.status_code == 200 and r.content:
+                    return r.content
+                status = r.status_code
+            except requests.exceptions.RequestException as e:
+                status = e
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"Audio chưa sẵn sàng sau {attempt} lần thử ({status})")
+            time.sleep(min(delay, remaining))
+            delay = next_delay(delay)
+
+    def synthesize(self, text, deadline):
+        return self.poll(self.request(text, deadline), deadline)
+
+    # ---------- asyncio (aiohttp) ----------
+    async def request_async(self, session, text, deadline):
+        delay = POLL_INITIAL
+        while True:
+            timeout = aiohttp.ClientTimeout(total=max(1.0, min(REQUEST_TIMEOUT, deadline - time.monotonic())))
+            try:
+                async with session.post(self.url, headers=self.headers(), data=text.encode("utf-8"),
+                                        timeout=timeout) as response:
+                    status, body = response.status, await response.text()
+                    if status == 200:
+                        payload = await response.json(content_type=None)
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, body = None, repr(e)
+
+            if (status is None or status in RETRY_STATUS) and time.monotonic() + delay < deadline:
+                await asyncio.sleep(delay)
+                delay = next_delay(delay)
+                continue
+            if status is None:
+                raise Exception(f"Lỗi kết nối FPT TTS: {body}")
+            raise Exception(f"TTS request failed (Mã {status}): {body}")
+
+        audio_url = payload.get("async")
+        if not audio_url:
+            raise Exception("Không nhận được link audio từ FPT")
+        return audio_url
+
+    async def poll_async(self, session, audio_url, deadline):
+        delay, attempt = POLL_INITIAL, 0
+        while True:
+            attempt += 1
+            timeout = aiohttp.ClientTimeout(total=max(1.0, min(REQUEST_TIMEOUT, deadline - time.monotonic())))
+            try:
+                async with session.get(audio_url, headers={"User-Agent": "Mozilla/5.0"},
+                                       timeout=timeout) as r:
+                    if r.status == 200:
+                        data = await r.read()
+                        if data:
+                            return data
+                    status = r.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = repr(e)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"Audio chưa sẵn sàng sau {attempt} lần thử ({status})")
+            await asyncio.sleep(min(delay, remaining))
+            delay = next_delay(delay)
+
+    async def synthesize_async(self, session, text, deadline):
+        return await self.poll_async(session, await self.request_async(session, text, deadline), deadline)
+
+
+TTS_BACKENDS = {
+    "fpt": FPTBackend,
+}
+
+
+def get_tts_backend(name=None, **kwargs):
+    name = name or TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend {name!r}, expected one of {tuple(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name](**kwargs)
+
+
+# =======================
+# ASYNC CLIENT: NHIỀU JOB CÙNG LÚC
+# =======================
+async def synthesize_all_async(backend, texts, deadline, part_deadline, concurrency=TTS_CONCURRENCY):
+    """
+    Bytes audio cho từng text (cùng thứ tự), tối đa `concurrency` job đang
+    chạy. Mỗi job có hạn riêng part_deadline giây kể từ lúc bắt đầu, không
+    vượt quá `deadline` chung. Job đầu tiên lỗi làm cả lô lỗi.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def run(text):
+            async with semaphore:
+                job_deadline = min(deadline, time.monotonic() + part_deadline)
+                return await backend.synthesize_async(session, text, job_deadline)
+
+        return await asyncio.gather(*(run(t) for t in texts))
+
+
+def synthesize_all(backend, texts, deadline, part_deadline, concurrency=TTS_CONCURRENCY):
+    """Blocking wrapper (asyncio.run) cho code đồng bộ như app.py."""
+    return asyncio.run(synthesize_all_async(backend, texts, deadline, part_deadline, concurrency))
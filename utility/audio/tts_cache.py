@@ -0,0 +1,58 @@
+import os
+import re
+import unicodedata
+from utility import disk_cache
+
+# =======================
+# CẤU HÌNH TTS CACHE
+# =======================
+TTS_NAMESPACE = "tts"
+TTS_CACHE_VERSION = 1
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+# =======================
+# KEY
+# =======================
+def normalize_tts_text(text: str) -> str:
+    """Cùng cách đọc → cùng key: NFC + gộp khoảng trắng (không đổi chữ hoa/dấu câu vì ảnh hưởng ngữ điệu)."""
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def tts_key(text: str, voice: str, endpoint: str) -> str:
+    return disk_cache.make_key("tts", TTS_CACHE_VERSION, endpoint, voice, normalize_tts_text(text))
+
+
+# =======================
+# LOOKUP / STORE
+# =======================
+def lookup_tts_path(text: str, voice: str, endpoint: str):
+    return disk_cache.lookup(TTS_NAMESPACE, tts_key(text, voice, endpoint), ".mp3")
+
+
+def store_tts(text: str, voice: str, endpoint: str, data: bytes) -> str:
+    """Atomic write (temp + rename): concurrent writers of one text never leave a partial file."""
+    return disk_cache.store_bytes(TTS_NAMESPACE, tts_key(text, voice, endpoint), data, ".mp3", TTS_CACHE_MAX_BYTES)
+
+
+def cached_tts_path(text: str, voice: str, endpoint: str, synthesize) -> str:
+    """
+    Path of the cached audio for (text, voice, endpoint). synthesize(text) → bytes
+    is only called on a miss; concurrent callers for the same text wait on a
+    per-key file lock and then reuse the stored file.
+    """
+    key = tts_key(text, voice, endpoint)
+    cached = disk_cache.lookup(TTS_NAMESPACE, key, ".mp3")
+    if cached:
+        return cached
+    with disk_cache.key_lock(TTS_NAMESPACE, key):
+        cached = disk_cache.lookup(TTS_NAMESPACE, key, ".mp3", count=False)
+        if cached:
+            return cached
+        return disk_cache.store_bytes(TTS_NAMESPACE, key, synthesize(text), ".mp3", TTS_CACHE_MAX_BYTES)
+
+
+def get_tts_cache_stats():
+    return disk_cache.get_cache_stats(TTS_NAMESPACE)
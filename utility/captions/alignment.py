@@ -0,0 +1,227 @@
+import difflib
+import math
+import re
+import unicodedata
+from functools import lru_cache
+
+# =======================
+# TOKENIZE / NORMALIZE (precompiled)
+# =======================
+
+WORD_CHARS = "0-9A-Za-zÀ-ỹăâđêôơưĂÂÊÔƠƯĐà-ỹ"
+TOKEN_RE = re.compile(f"[{WORD_CHARS}]+")
+NON_WORD_RE = re.compile(f"[^{WORD_CHARS}]")
+
+WORD_FIX = {
+    "hách": "hack",
+    "trùng": "trùm",
+    "lau": "lao",
+    "hát": "hạt"
+}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def normalize_word(word):
+    word = NON_WORD_RE.sub("", unicodedata.normalize("NFC", word))
+    return WORD_FIX.get(word.lower(), word.lower())
+
+
+# =======================
+# SCRIPT → PHRASES
+# =======================
+
+SENTENCE_END_RE = re.compile(r"[.!?]")
+
+
+def split_script_to_phrases(script_text):
+    """
+    Cắt script theo đúng nhịp đã viết cho TTS
+    """
+    script_text = unicodedata.normalize("NFC", script_text)
+
+    lines = []
+    for line in script_text.split("\n"):
+        parts = SENTENCE_END_RE.split(line)
+        for p in parts:
+            p = p.strip()
+            if p:
+                lines.append(p)
+
+    return lines
+
+
+# =======================
+# COST MODEL
+# =======================
+
+MATCH_THRESHOLD = 0.7        # như bản greedy: ratio > 0.7 là khớp
+GAP_COST = 0.6               # từ script không được đọc / từ Whisper thừa
+BAND_MIN = 40                # nửa bề rộng dải quanh đường chéo (theo token)
+
+
+@lru_cache(maxsize=65536)
+def word_similarity(a, b):
+    """Character similarity in [0, 1] (difflib ratio, cached per word pair)."""
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def substitution_cost(a, b):
+    sim = word_similarity(a, b)
+    # khớp tốt gần như miễn phí; lệch nhiều vẫn rẻ hơn 2 gap để giữ nhịp
+    return (1.0 - sim) * (0.5 if sim > MATCH_THRESHOLD else 1.0)
+
+
+# =======================
+# BANDED GLOBAL ALIGNMENT
+# =======================
+
+def band_width(n, m, band=None):
+    # dải phải nối liền giữa hai hàng liên tiếp dù độ dài chênh lệch
+    return max(band or BAND_MIN, math.ceil(m / max(1, n)) + 1)
+
+
+def align_tokens(script_tokens, heard_tokens, band=None):
+    """
+    Needleman-Wunsch over the two token streams, restricted to a band around
+    the scaled diagonal, so cost is O(len(script) * band) instead of
+    O(len(script) * len(heard)).
+
+    Returns a list with, for every script token, the index of the heard token
+    it is aligned to, or None when it was skipped.
+    """
+    n, m = len(script_tokens), len(heard_tokens)
+    if n == 0:
+        return []
+    if m == 0:
+        return [None] * n
+
+    width = band_width(n, m, band)
+    lo = [max(0, round(i * m / n) - width) for i in range(n + 1)]
+    hi = [min(m, round(i * m / n) + width) for i in range(n + 1)]
+    lo[0], hi[n] = 0, m
+    inf = float("inf")
+
+    # row i covers heard positions lo[i]..hi[i]; moves: 0 diag, 1 up (skip script), 2 left (skip heard)
+    prev = [j * GAP_COST for j in range(lo[0], hi[0] + 1)]
+    moves = [[2] * len(prev)]
+    moves[0][0] = 0
+    for i in range(1, n + 1):
+        a = script_tokens[i - 1]
+        plo, phi, clo, chi = lo[i - 1], hi[i - 1], lo[i], hi[i]
+        row = [inf] * (chi - clo + 1)
+        move = bytearray(chi - clo + 1)
+        for j in range(clo, chi + 1):
+            best, how = inf, 0
+            if plo <= j - 1 <= phi:
+                best = prev[j - 1 - plo] + substitution_cost(a, heard_tokens[j - 1])
+            if plo <= j <= phi:
+                up = prev[j - plo] + GAP_COST
+                if up < best:
+                    best, how = up, 1
+            if j > clo:
+                left = row[j - 1 - clo] + GAP_COST
+                if left < best:
+                    best, how = left, 2
+            row[j - clo] = best
+            move[j - clo] = how
+        prev = row
+        moves.append(move)
+
+    mapping = [None] * n
+    i, j = n, m
+    while i > 0:
+        how = moves[i][j - lo[i]]
+        if how == 0 and j > 0:
+            mapping[i - 1] = j - 1
+            i, j = i - 1, j - 1
+        elif how == 1 or j == 0:
+            i -= 1
+        else:
+            j -= 1
+    return mapping
+
+
+# =======================
+# PHRASE BOUNDARIES FROM THE PATH
+# =======================
+
+def align_phrases(script_phrases, whisper_words, band=None):
+    """
+    [((start, end), phrase), ...] for every phrase with at least one token.
+    Phrases whose tokens all went unheard get the gap between neighbours
+    instead of being dropped.
+    """
+    phrase_tokens = [tokenize(p) for p in script_phrases]
+    words = [w for w in whisper_words if w["text"]]
+    flat = [t for tokens in phrase_tokens for t in tokens]
+    mapping = align_tokens(flat, [w["text"] for w in words], band)
+
+    spans, pos = [], 0
+    for phrase, tokens in zip(script_phrases, phrase_tokens):
+        if not tokens:
+            continue
+        heard = [mapping[k] for k in range(pos, pos + len(tokens)) if mapping[k] is not None]
+        pos += len(tokens)
+        if heard:
+            spans.append([words[heard[0]]["start"], words[heard[-1]]["end"], phrase])
+        else:
+            spans.append([None, None, phrase])
+
+    for k, span in enumerate(spans):
+        if span[0] is None:
+            before = spans[k - 1][1] if k > 0 else 0.0
+            after = next((s[0] for s in spans[k + 1:] if s[0] is not None), None)
+            span[0] = before if before is not None else 0.0
+            span[1] = after if after is not None and after > span[0] else span[0] + 0.5
+
+    return [((round(s, 2), round(e, 2)), phrase) for s, e, phrase in spans]
+
+
+# =======================
+# GREEDY (bản cũ, giữ để so sánh / benchmark)
+# =======================
+
+def greedy_align(script_phrases, whisper_words):
+    captions = []
+    w_idx = 0
+
+    for phrase in script_phrases:
+        tokens = tokenize(phrase)
+        if not tokens:
+            continue
+
+        start_time = None
+        end_time = None
+        matched = 0
+
+        for i in range(w_idx, len(whisper_words)):
+            score = difflib.SequenceMatcher(
+                None,
+                whisper_words[i]["text"],
+                tokens[matched]
+            ).ratio()
+
+            if score > 0.7:
+                if start_time is None:
+                    start_time = whisper_words[i]["start"]
+                end_time = whisper_words[i]["end"]
+                matched += 1
+                w_idx = i + 1
+
+                if matched >= len(tokens):
+                    break
+
+        if start_time is None:
+            continue
+
+        captions.append((
+            (round(start_time, 2), round(end_time, 2)),
+            phrase
+        ))
+
+    return captions
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark + accuracy check: banded DP alignment vs the old greedy scan.
+
+    python -m utility.captions.alignment_benchmark
+
+Synthetic scripts of growing length are "heard" with Whisper-like noise
+(misspelt, dropped and inserted words). Reports time per script length, the
+share of phrases whose start is within TOLERANCE of the truth, and how many
+phrases each engine dropped. On clean input both engines must agree exactly.
+"""
+import random
+import time
+from utility.captions.alignment import align_phrases, greedy_align, tokenize, word_similarity
+
+SYLLABLES = [
+    "ba", "con", "mèo", "đang", "chạy", "trên", "mái", "nhà", "người", "thợ",
+    "hack", "trùm", "lao", "hạt", "giống", "công", "nghệ", "tương", "lai", "thế",
+    "giới", "khám", "phá", "bí", "ẩn", "vũ", "trụ", "năng", "lượng", "mặt",
+]
+SIZES = [50, 100, 200, 400, 800]     # số câu
+TOLERANCE = 0.15                      # giây
+WORD_SECONDS = 0.3
+
+
+def make_script(n_phrases, rng):
+    return [" ".join(rng.choice(SYLLABLES) for _ in range(rng.randint(4, 12)))
+            for _ in range(n_phrases)]
+
+
+def hear(phrases, rng, noise):
+    """Whisper-like words for the phrases + true (start, end) per phrase."""
+    words, truth, t = [], [], 0.0
+    for phrase in phrases:
+        start = t
+        for token in tokenize(phrase):
+            r = rng.random()
+            if r < noise / 3:
+                t += WORD_SECONDS                       # từ bị nuốt
+                continue
+            if r < 2 * noise / 3:
+                token = token[:-1] + "x"                # nghe sai một ký tự
+            words.append({"text": token, "start": t, "end": t + WORD_SECONDS})
+            t += WORD_SECONDS
+            if rng.random() < noise / 3:                # từ thừa
+                words.append({"text": rng.choice(["ừ", "à", "thì"]), "start": t, "end": t + 0.1})
+                t += 0.1
+        truth.append((start, t))
+        t += 0.2
+    return words, truth
+
+
+def score(captions, phrases, truth):
+    by_phrase = {}
+    for (start, _), phrase in captions:
+        by_phrase.setdefault(phrase, []).append(start)
+    hits = 0
+    for phrase, (start, _) in zip(phrases, truth):
+        starts = by_phrase.get(phrase, [])
+        if any(abs(s - start) <= TOLERANCE for s in starts):
+            hits += 1
+    return hits / len(phrases), len(phrases) - len(captions)
+
+
+def run(engine, phrases, words):
+    word_similarity.cache_clear()
+    started = time.perf_counter()
+    captions = engine(phrases, words)
+    return captions, time.perf_counter() - started
+
+
+def main(noise=0.15, seed=7):
+    rng = random.Random(seed)
+
+    # clean input: DP must reproduce the greedy output exactly
+    phrases = make_script(100, rng)
+    words, _ = hear(phrases, rng, 0.0)
+    same = align_phrases(phrases, words) == greedy_align(phrases, words)
+    print(f"clean input, DP == greedy: {same}")
+
+    print(f"{'phrases':>8} {'words':>7} {'greedy s':>9} {'dp s':>8} "
+          f"{'greedy acc':>11} {'dp acc':>7} {'greedy drop':>12} {'dp drop':>8}")
+    for n in SIZES:
+        phrases = make_script(n, rng)
+        words, truth = hear(phrases, rng, noise)
+        greedy, greedy_s = run(greedy_align, phrases, words)
+        dp, dp_s = run(align_phrases, phrases, words)
+        greedy_acc, greedy_drop = score(greedy, phrases, truth)
+        dp_acc, dp_drop = score(dp, phrases, truth)
+        print(f"{n:>8} {len(words):>7} {greedy_s:>9.3f} {dp_s:>8.3f} "
+              f"{greedy_acc:>11.1%} {dp_acc:>7.1%} {greedy_drop:>12} {dp_drop:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import re
+from utility.captions.alignment import split_script_to_phrases, tokenize
+
+# =======================
+# CONFIG
+# =======================
+
+PHRASE_PAUSE_SYLLABLES = 0.8   # khoảng ngắt sau dấu câu ≈ 0.8 âm tiết
+MIN_PHRASE_SECONDS = 0.3
+
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+VIETNAMESE_RE = re.compile(r"[^0-9a-z]")
+
+
+# =======================
+# SYLLABLES
+# =======================
+
+def word_syllables(token):
+    """
+    Âm tiết ước lượng của một token: chữ Việt = 1 âm tiết/chữ; số đọc
+    từng chữ số; từ Latin không dấu (tên riêng, tiếng Anh) đếm cụm nguyên âm.
+    """
+    if token.isdigit():
+        return len(token)
+    if VIETNAMESE_RE.search(token):
+        return 1
+    return max(1, len(VOWEL_GROUP_RE.findall(token)))
+
+
+def phrase_syllables(phrase):
+    return sum(word_syllables(t) for t in tokenize(phrase))
+
+
+# =======================
+# PARTS → TIMED CAPTIONS
+# =======================
+
+def timed_captions_from_parts(tts_parts):
+    """
+    timed_captions without Whisper, from the per-part timings returned by
+    generate_audio_parts ([{"text", "start", "end", ...}]): every part is
+    cut into the same phrases as split_script_to_phrases and its exact audio
+    duration is shared out by syllable count, with a short pause weight
+    after each phrase but the last.
+
+    Returns:
+        list: [((start, end), phrase), ...]
+    """
+    captions = []
+    for part in tts_parts:
+        phrases = [p for p in split_script_to_phrases(part["text"]) if tokenize(p)]
+        if not phrases:
+            continue
+        weights = [phrase_syllables(p) for p in phrases]
+        pauses = PHRASE_PAUSE_SYLLABLES * (len(phrases) - 1)
+        seconds_per_syllable = (part["end"] - part["start"]) / (sum(weights) + pauses)
+
+        t = part["start"]
+        for k, (phrase, weight) in enumerate(zip(phrases, weights)):
+            end = t + weight * seconds_per_syllable
+            if k == len(phrases) - 1:
+                end = part["end"]
+            end = max(end, t + MIN_PHRASE_SECONDS)
+            captions.append(((round(t, 2), round(end, 2)), phrase))
+            t = end + PHRASE_PAUSE_SYLLABLES * seconds_per_syllable
+    return captions
@@ -0,0 +1,145 @@
+import os
+import torch
+from whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+from whisper.timing import find_alignment
+from whisper.tokenizer import get_tokenizer
+from utility.audio.audio_asset import whisper_audio
+
+# =======================
+# CONFIG
+# =======================
+
+WHISPER_LANGUAGE = os.environ.get("WHISPER_LANGUAGE", "vi")
+WINDOW_SECONDS = 30.0        # context của encoder Whisper
+WINDOW_FILL = 0.85           # phần cửa sổ được lấp bằng text ước lượng
+COMMIT_MARGIN = 2.0          # từ kết thúc gần mép cửa sổ → căn lại ở cửa sổ sau
+MAX_TEXT_TOKENS = 400        # < 448 context của decoder
+MIN_WORD_SECONDS = 0.02
+
+
+# =======================
+# FORCED ALIGNMENT
+# =======================
+
+def alignment_tokenizer(model, language=None):
+    return get_tokenizer(
+        model.is_multilingual,
+        num_languages=getattr(model, "num_languages", 99),
+        language=language or WHISPER_LANGUAGE,
+        task="transcribe",
+    )
+
+
+def window_mel(model, audio, start_sample):
+    """Log-mel of one 30 s window starting at start_sample, plus its real frame count."""
+    chunk = audio[start_sample:start_sample + int(WINDOW_SECONDS * SAMPLE_RATE)]
+    mel = log_mel_spectrogram(torch.from_numpy(chunk), model.dims.n_mels)
+    mel = pad_or_trim(mel, N_FRAMES).to(model.device)
+    return mel, min(N_FRAMES, len(chunk) // HOP_LENGTH)
+
+
+def words_for_window(words, first, seconds_per_char, tokenizer):
+    """How many script words (from `first`) should fit into one window."""
+    budget = WINDOW_SECONDS * WINDOW_FILL
+    used, n_tokens, last = 0.0, 0, first
+    while last < len(words):
+        word_tokens = len(tokenizer.encode(" " + words[last]))
+        if last > first and (used + len(words[last]) * seconds_per_char > budget
+                             or n_tokens + word_tokens > MAX_TEXT_TOKENS):
+            break
+        used += (len(words[last]) + 1) * seconds_per_char
+        n_tokens += word_tokens
+        last += 1
+    return last
+
+
+def map_timings(window_words, timings):
+    """
+    Map Whisper's word timings back onto the script words by character
+    position, so a tokenizer that splits/merges words differently cannot
+    shift the timestamps.
+    """
+    ends, pos = [], 0
+    for timing in timings:
+        pos += len(timing.word.strip())
+        ends.append((pos, timing.start, timing.end))
+
+    result, pos, j = [], 0, 0
+    for word in window_words:
+        first_char = pos
+        pos += len(word)
+        while j < len(ends) - 1 and ends[j][0] <= first_char:
+            j += 1
+        start = ends[j][1]
+        k = j
+        while k < len(ends) - 1 and ends[k][0] < pos:
+            k += 1
+        result.append((start, ends[k][2]))
+    return result
+
+
+def align_words(model, audio, words, language=None):
+    """
+    Timestamps (start, end) in seconds for every word of the known script.
+
+    Instead of decoding, the script tokens are fed to the decoder as given
+    and Whisper's cross-attention DTW (whisper.timing.find_alignment) places
+    them on the audio: one encoder + one decoder pass per 30 s window. Words
+    that end near the edge of a window are re-aligned in the next window,
+    which starts where the last confirmed word ended.
+    """
+    tokenizer = alignment_tokenizer(model, language)
+    total_seconds = len(audio) / SAMPLE_RATE
+    seconds_per_char = total_seconds / max(1, sum(len(w) + 1 for w in words))
+
+    timed = []
+    first, offset = 0, 0.0
+    while first < len(words):
+        start_sample = int(offset * SAMPLE_RATE)
+        mel, num_frames = window_mel(model, audio, start_sample)
+        last_window = offset + WINDOW_SECONDS >= total_seconds
+        last = len(words) if last_window else words_for_window(words, first, seconds_per_char, tokenizer)
+
+        window_words = words[first:last]
+        text_tokens = tokenizer.encode(" " + " ".join(window_words))[:MAX_TEXT_TOKENS]
+        timings = find_alignment(model, tokenizer, text_tokens, mel, num_frames)
+        spans = map_timings(window_words, [t for t in timings if t.word.strip()])
+
+        commit = len(spans)
+        if not last_window:
+            limit = num_frames * HOP_LENGTH / SAMPLE_RATE - COMMIT_MARGIN
+            commit = sum(1 for _, end in spans if end <= limit) or 1
+
+        for start, end in spans[:commit]:
+            start = max(offset + start, timed[-1][1] if timed else 0.0)
+            end = max(offset + end, start + MIN_WORD_SECONDS)
+            timed.append((start, end))
+
+        first += commit
+        offset = max(offset + 0.5, timed[-1][1]) if not last_window else offset
+
+    return timed
+
+
+def align_script_phrases(model, audio_filename, script_phrases, language=None):
+    """
+    [((start, end), phrase), ...] for every phrase, none dropped: each phrase
+    spans from its first word's start to its last word's end.
+    """
+    audio = whisper_audio(audio_filename)
+    phrase_words = [p.split() for p in script_phrases]
+    words = [w for ws in phrase_words for w in ws]
+    if not words:
+        return []
+
+    with torch.no_grad():
+        timed = align_words(model, audio, words, language)
+
+    captions, i = [], 0
+    for phrase, ws in zip(script_phrases, phrase_words):
+        if not ws:
+            continue
+        start, end = timed[i][0], timed[i + len(ws) - 1][1]
+        captions.append(((round(start, 2), round(end, 2)), phrase))
+        i += len(ws)
+    return captions
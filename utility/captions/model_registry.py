@@ -0,0 +1,266 @@
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+import torch
+from torch import nn
+from whisper.model import Linear as WhisperLinear
+from whisper_timestamped import load_model
+
+# =======================
+# CONFIG
+# =======================
+
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "medium")
+WHISPER_DEVICE = os.environ.get("WHISPER_DEVICE")            # None → cuda nếu có
+MODEL_IDLE_SECONDS = float(os.environ.get("MODEL_IDLE_SECONDS", 900))
+MODEL_MIN_FREE_BYTES = int(os.environ.get("MODEL_MIN_FREE_BYTES", 2 * 1024 ** 3))
+MODEL_CHECK_SECONDS = float(os.environ.get("MODEL_CHECK_SECONDS", 60))  # chu kỳ kiểm tra idle/RAM
+WHISPER_COMPUTE = os.environ.get("WHISPER_COMPUTE", "fp32")    # "fp32" | "int8" (CPU)
+COMPUTE_MODES = ("fp32", "int8")
+
+
+# =======================
+# ENTRY
+# =======================
+
+class ModelEntry:
+    """
+    Một model đã load. `lock` tuần tự hoá inference: whisper_timestamped gắn
+    hook vào các attention layer trong lúc transcribe nên một model không
+    dùng được đồng thời từ nhiều thread.
+    """
+
+    def __init__(self, key, model, load_seconds):
+        self.key = key
+        self.model = model
+        self.load_seconds = load_seconds
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.users = 0
+
+
+_models = {}                 # (model_size, device, compute) → ModelEntry
+_load_locks = {}             # key → Lock (mỗi combination chỉ load một lần)
+_registry_lock = threading.Lock()
+_watchdog = None
+
+
+def resolve_device(device=None):
+    device = device or WHISPER_DEVICE
+    if device:
+        return device
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_key(model_size=None, device=None, compute=None):
+    compute = compute or WHISPER_COMPUTE
+    if compute not in COMPUTE_MODES:
+        raise ValueError(f"Unknown compute mode {compute!r}, expected one of {COMPUTE_MODES}")
+    device = resolve_device(device)
+    if compute == "int8" and device != "cpu":
+        raise ValueError("compute='int8' is a CPU-only mode")
+    return (model_size or WHISPER_MODEL, device, compute)
+
+
+# =======================
+# REDUCED PRECISION (CPU)
+# =======================
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of every Linear layer (weights int8, activations
+    quantized on the fly). Whisper's own Linear subclass only adds a dtype
+    cast in forward, so it is turned back into nn.Linear first: quantize_dynamic
+    matches module types exactly.
+    """
+    for module in model.modules():
+        if type(module) is WhisperLinear:
+            module.__class__ = nn.Linear
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+# =======================
+# MEMORY PRESSURE
+# =======================
+
+def available_memory():
+    """Bytes of free memory on the model's device, or None if unknown."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def gpu_available_memory(device):
+    if not device.startswith("cuda") or not torch.cuda.is_available():
+        return None
+    free, _ = torch.cuda.mem_get_info(torch.device(device))
+    return free
+
+
+def under_pressure(device, min_free=None):
+    min_free = MODEL_MIN_FREE_BYTES if min_free is None else min_free
+    free = gpu_available_memory(device)
+    if free is None:
+        free = available_memory()
+    return free is not None and free < min_free
+
+
+# =======================
+# EVICTION
+# =======================
+
+def _drop(entry):
+    _models.pop(entry.key, None)
+    entry.model = None
+    gc.collect()
+    if entry.key[1].startswith("cuda") and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    print(f"Whisper model evicted: {entry.key}")
+
+
+def evict_idle(max_idle=None, force=False):
+    """
+    Drop models unused for max_idle seconds (least recently used first).
+    With force=True every idle model goes regardless of age. Models that are
+    transcribing right now are never dropped. Returns the evicted keys.
+    """
+    max_idle = MODEL_IDLE_SECONDS if max_idle is None else max_idle
+    now = time.monotonic()
+    evicted = []
+    with _registry_lock:
+        for entry in sorted(_models.values(), key=lambda e: e.last_used):
+            if entry.users:
+                continue
+            if force or now - entry.last_used >= max_idle:
+                _drop(entry)
+                evicted.append(entry.key)
+    return evicted
+
+
+def relieve_pressure(device):
+    """Drop idle models, oldest first, until the device has room again."""
+    evicted = []
+    while under_pressure(device):
+        with _registry_lock:
+            idle = sorted((e for e in _models.values() if not e.users), key=lambda e: e.last_used)
+            if not idle:
+                break
+            _drop(idle[0])
+            evicted.append(idle[0].key)
+    return evicted
+
+
+def _watch():
+    """
+    Runs while any model is loaded: a warm model left idle while renders on
+    the host eat the RAM is dropped here, not only when the next model loads.
+    """
+    global _watchdog
+    while True:
+        time.sleep(MODEL_CHECK_SECONDS)
+        evict_idle()
+        with _registry_lock:
+            devices = {key[1] for key in _models}
+            if not devices:
+                _watchdog = None
+                return
+        for device in devices:
+            relieve_pressure(device)
+
+
+def _ensure_watchdog():
+    global _watchdog
+    with _registry_lock:
+        if _watchdog is None:
+            _watchdog = threading.Thread(target=_watch, name="whisper-evict", daemon=True)
+            _watchdog.start()
+
+
+# =======================
+# LOAD / ACQUIRE
+# =======================
+
+def get_model_entry(model_size=None, device=None, compute=None):
+    """Loaded ModelEntry for the combination, loading it on first use only."""
+    key = model_key(model_size, device, compute)
+    with _registry_lock:
+        entry = _models.get(key)
+        if entry is not None:
+            return entry
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        with _registry_lock:
+            entry = _models.get(key)
+        if entry is not None:
+            return entry
+
+        evict_idle()
+        relieve_pressure(key[1])
+        started = time.time()
+        model = load_model(key[0], device=key[1])
+        if key[2] == "int8":
+            model = quantize_int8(model)
+        entry = ModelEntry(key, model, time.time() - started)
+        print(f"Whisper model loaded: {key} in {entry.load_seconds:.1f}s")
+        with _registry_lock:
+            _models[key] = entry
+        _ensure_watchdog()
+        return entry
+
+
+@contextmanager
+def use_model(model_size=None, device=None, compute=None):
+    """
+    Borrow a warm model for one transcription. Calls on the same model are
+    serialized; different models run concurrently.
+    """
+    while True:
+        entry = get_model_entry(model_size, device, compute)
+        with _registry_lock:
+            # bị evict giữa lúc lấy và lúc đăng ký → load lại
+            if _models.get(entry.key) is entry:
+                entry.users += 1
+                break
+    try:
+        with entry.lock:
+            yield entry.model
+    finally:
+        with _registry_lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+
+
+def preload_models(model_sizes=None, device=None, compute=None, background=False):
+    """
+    Load models before the first video needs them. With background=True the
+    loads run in a daemon thread (returned) so startup work can overlap.
+    """
+    model_sizes = model_sizes or [WHISPER_MODEL]
+
+    def load_all():
+        for size in model_sizes:
+            get_model_entry(size, device, compute)
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, name="whisper-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def loaded_models():
+    with _registry_lock:
+        return {
+            key: {"users": e.users, "idle_seconds": round(time.monotonic() - e.last_used, 1),
+                  "load_seconds": round(e.load_seconds, 1)}
+            for key, e in _models.items()
+        }
@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import numpy as np
+import torch
+from whisper.audio import SAMPLE_RATE
+from whisper_timestamped import transcribe_timestamped
+
+# =======================
+# CONFIG
+# =======================
+
+CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", 45))
+SPLIT_SEARCH_SECONDS = 5.0     # tìm khoảng lặng trong ±5 s quanh mốc cắt
+CHUNK_OVERLAP = 1.0            # mỗi chunk nghe thêm 1 s hai bên để không cắt cụt từ
+FRAME_SECONDS = 0.02           # khung tính năng lượng
+MIN_PARALLEL_SECONDS = 2 * CHUNK_SECONDS
+
+
+# =======================
+# SILENCE SPLITS
+# =======================
+
+def frame_energy(audio):
+    hop = int(FRAME_SECONDS * SAMPLE_RATE)
+    n = len(audio) // hop
+    frames = audio[:n * hop].reshape(n, hop)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def silence_splits(audio, chunk_seconds=CHUNK_SECONDS):
+    """
+    Cut points (seconds) roughly every chunk_seconds, each moved to the
+    quietest 200 ms within ±SPLIT_SEARCH_SECONDS so no word is split.
+    """
+    energy = frame_energy(audio)
+    smooth = np.convolve(energy, np.ones(10) / 10, mode="same")
+    total = len(audio) / SAMPLE_RATE
+    splits, target = [], chunk_seconds
+    while target < total - chunk_seconds / 2:
+        lo = int(max(0, target - SPLIT_SEARCH_SECONDS) / FRAME_SECONDS)
+        hi = int(min(total, target + SPLIT_SEARCH_SECONDS) / FRAME_SECONDS)
+        cut = (lo + int(np.argmin(smooth[lo:hi]))) * FRAME_SECONDS
+        splits.append(cut)
+        target = cut + chunk_seconds
+    return splits
+
+
+def make_chunks(audio, chunk_seconds=CHUNK_SECONDS):
+    """[(own_start, own_end, listen_start, listen_end)] in seconds."""
+    total = len(audio) / SAMPLE_RATE
+    bounds = [0.0] + silence_splits(audio, chunk_seconds) + [total]
+    return [
+        (start, end, max(0.0, start - CHUNK_OVERLAP), min(total, end + CHUNK_OVERLAP))
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+# =======================
+# WORKER (fork: model weights shared copy-on-write)
+# =======================
+
+_worker_model = None
+_worker_audio = None
+_worker_options = None
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+
+def _transcribe_chunk(chunk):
+    own_start, own_end, listen_start, listen_end = chunk
+    samples = _worker_audio[int(listen_start * SAMPLE_RATE):int(listen_end * SAMPLE_RATE)]
+    result = transcribe_timestamped(_worker_model, samples, verbose=False, **_worker_options)
+    return chunk, result
+
+
+# =======================
+# STITCH
+# =======================
+
+def stitch_results(chunk_results):
+    """
+    Shift each chunk's segments/words to absolute time and keep only the
+    words whose midpoint lies in that chunk's own range, so words heard in
+    two overlapping chunks are counted once.
+    """
+    segments, texts, language = [], [], None
+    for (own_start, own_end, listen_start, _), result in chunk_results:
+        language = language or result.get("language")
+        for seg in result.get("segments", []):
+            words = []
+            for w in seg.get("words", []):
+                if "start" not in w or "end" not in w:
+                    continue
+                start, end = w["start"] + listen_start, w["end"] + listen_start
+                if own_start <= (start + end) / 2 < own_end:
+                    words.append(dict(w, start=start, end=end))
+            if not words:
+                continue
+            text = " ".join(w["text"] for w in words)
+            segments.append(dict(
+                seg, id=len(segments), start=words[0]["start"], end=words[-1]["end"],
+                text=text, words=words
+            ))
+            texts.append(text)
+    return {"text": " ".join(texts), "segments": segments, "language": language}
+
+
+def transcribe_parallel(model, audio, options, workers=None, chunk_seconds=CHUNK_SECONDS):
+    """
+    transcribe_timestamped over silence-split chunks in a fork pool. The
+    children inherit the loaded model, so weights are not copied or reloaded.
+    Short audio (< MIN_PARALLEL_SECONDS), workers == 1 or a model on GPU
+    (CUDA cannot be used again in a forked child) get one ordinary pass
+    over the whole buffer in-process.
+    Returns a result shaped like transcribe_timestamped's.
+    """
+    global _worker_model, _worker_audio, _worker_options
+    workers = workers or os.cpu_count() or 1
+    audio = np.asarray(audio, dtype=np.float32)
+    device = next(model.parameters()).device.type
+    if device != "cpu" and workers != 1:
+        print(f"Model on {device}: transcribing in-process instead of forking")
+
+    in_process = device != "cpu" or workers == 1 or len(audio) < MIN_PARALLEL_SECONDS * SAMPLE_RATE
+    chunks = [] if in_process else make_chunks(audio, chunk_seconds)
+    if len(chunks) < 2:
+        return transcribe_timestamped(model, audio, verbose=False, **options)
+
+    _worker_model, _worker_audio, _worker_options = model, audio, options
+    try:
+        workers = min(workers, len(chunks))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            results = pool.map(_transcribe_chunk, chunks, chunksize=1)
+        print(f"Transcribed {len(chunks)} chunks on {workers} processes")
+        return stitch_results(results)
+    finally:
+        _worker_model = _worker_audio = _worker_options = None
@@ -0,0 +1,99 @@
+"""
+fp32 vs dynamic-int8 Whisper on CPU: speed, memory and word-timing drift.
+
+    python -m utility.captions.quantization_benchmark [audio_tts.mp3] [model_size]
+
+Each variant is loaded through the model registry and transcribes the sample
+once for warm-up and REPEATS times for timing. The int8 words are aligned to
+the fp32 words (alignment.align_tokens) and start/end drift is reported
+against CAPTION_TOLERANCE.
+"""
+import resource
+import sys
+import time
+import torch
+from whisper.audio import load_audio
+from whisper_timestamped import transcribe_timestamped
+from utility.captions.alignment import align_tokens
+from utility.captions.model_registry import evict_idle, use_model
+from utility.captions.timed_captions_generator import TRANSCRIBE_OPTIONS, extract_whisper_words
+
+REPEATS = 2
+CAPTION_TOLERANCE = 0.1      # giây; lệch ít hơn 1 khung hình ở 10 fps
+
+
+def rss_bytes():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def weight_bytes(model):
+    total = sum(t.numel() * t.element_size() for t in model.state_dict().values() if torch.is_tensor(t))
+    # packed int8 weights are not in state_dict() as plain tensors
+    for module in model.modules():
+        packed = getattr(module, "_packed_params", None)
+        if packed is not None:
+            weight, _ = packed._weight_bias()
+            total += weight.numel() * weight.element_size()
+    return total
+
+
+def run_variant(audio, model_size, compute):
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    with use_model(model_size, "cpu", compute) as model:
+        load_seconds = time.perf_counter() - started
+        transcribe_timestamped(model, audio, verbose=False, **TRANSCRIBE_OPTIONS)
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            result = transcribe_timestamped(model, audio, verbose=False, **TRANSCRIBE_OPTIONS)
+        seconds = (time.perf_counter() - started) / REPEATS
+        weights = weight_bytes(model)
+    report = {
+        "compute": compute,
+        "load_s": round(load_seconds, 1),
+        "transcribe_s": round(seconds, 2),
+        "weights_mb": round(weights / 1024 ** 2),
+        "rss_delta_mb": round((rss_bytes() - rss_before) / 1024 ** 2),
+    }
+    evict_idle(force=True)
+    return report, extract_whisper_words(result)
+
+
+def timing_drift(reference, candidate):
+    ref = [w for w in reference if w["text"]]
+    cand = [w for w in candidate if w["text"]]
+    mapping = align_tokens([w["text"] for w in ref], [w["text"] for w in cand])
+    pairs = [(ref[i], cand[j]) for i, j in enumerate(mapping)
+             if j is not None and ref[i]["text"] == cand[j]["text"]]
+    drifts = [max(abs(a["start"] - b["start"]), abs(a["end"] - b["end"])) for a, b in pairs]
+    if not drifts:
+        return {"matched_words": 0}
+    drifts.sort()
+    return {
+        "matched_words": f"{len(pairs)}/{len(ref)}",
+        "mean_drift_s": round(sum(drifts) / len(drifts), 3),
+        "p95_drift_s": round(drifts[int(0.95 * (len(drifts) - 1))], 3),
+        "max_drift_s": round(drifts[-1], 3),
+        "within_tolerance": f"{sum(d <= CAPTION_TOLERANCE for d in drifts) / len(drifts):.1%}",
+    }
+
+
+def main(audio_file="audio_tts.mp3", model_size="medium"):
+    audio = load_audio(audio_file)
+    print(f"{audio_file}: {len(audio) / 16000:.1f}s, model {model_size}, {torch.get_num_threads()} threads")
+
+    fp32, fp32_words = run_variant(audio, model_size, "fp32")
+    int8, int8_words = run_variant(audio, model_size, "int8")
+    for report in (fp32, int8):
+        print(report)
+    print(f"speed-up: {fp32['transcribe_s'] / max(int8['transcribe_s'], 1e-6):.2f}x, "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+    print("int8 vs fp32 word timing:", timing_drift(fp32_words, int8_words))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -1,13 +1,21 @@
-import re
-import unicodedata
-import difflib
-from whisper_timestamped import load_model, transcribe_timestamped
+from whisper_timestamped import transcribe_timestamped
+from utility.audio.audio_asset import whisper_audio
+from utility.captions.model_registry import model_key, use_model
+from utility.captions.transcript_cache import cached_transcribe, transcript_key
+from utility.captions.parallel_transcribe import CHUNK_SECONDS, transcribe_parallel
+from utility.captions.forced_alignment import align_script_phrases
+from utility.captions.alignment import align_phrases, normalize_word, split_script_to_phrases
 
 # =======================
 # MAIN
 # =======================
 
-def generate_timed_captions(audio_filename, script_json, model_size="medium"):
+CAPTION_MODES = ("transcribe", "align")
+TRANSCRIBE_OPTIONS = {"fp16": False}
+
+
+def generate_timed_captions(audio_filename, script_json, model_size="medium", device=None,
+                            mode="transcribe", parallel=False, workers=None, compute=None):
     """
     Tạo caption có timestamp dựa trên audio và script mới dạng JSON.
     
@@ -15,19 +23,41 @@ def generate_timed_captions(audio_filename, script_json, model_size="medium"):
         audio_filename (str): File audio cần tạo captions.
         script_json (dict): Script dạng mới {title, script_parts, call_to_action}.
         model_size (str): Kích thước model Whisper.
+        device (str): "cpu" / "cuda"; None → tự chọn.
+        mode (str): "transcribe" = Whisper decode + so khớp với script;
+            "align" = chỉ căn thời gian cho đúng text của script (forced
+            alignment), nhanh hơn nhiều và không bỏ câu nào.
+        parallel (bool): "transcribe" theo chunk (cắt ở khoảng lặng) trên
+            nhiều process dùng chung model.
+        workers (int): Số process khi parallel; None → số core.
+        compute (str): "fp32" hoặc "int8" (quantize động, chỉ CPU);
+            None → WHISPER_COMPUTE.
     
     Returns:
         list: [(start_end_tuple, phrase), ...]
     """
-    model = load_model(model_size)
+    if mode not in CAPTION_MODES:
+        raise ValueError(f"Unknown caption mode {mode!r}, expected one of {CAPTION_MODES}")
+
+    if mode == "align":
+        script_phrases = split_script_to_phrases(extract_text_from_json(script_json))
+        with use_model(model_size, device, compute) as model:
+            return align_script_phrases(model, audio_filename, script_phrases)
+
+    # Transcribe audio với Whisper (model dùng chung, load một lần mỗi process).
+    # Kết quả thô được cache theo nội dung audio + model + options → lần sau
+    # chỉ chạy lại bước align.
+    audio = whisper_audio(audio_filename)
+    options = dict(TRANSCRIBE_OPTIONS, chunk_seconds=CHUNK_SECONDS) if parallel else TRANSCRIBE_OPTIONS
+    key = transcript_key(audio, model_key(model_size, device, compute), options)
 
-    # Transcribe audio với Whisper
-    whisper_result = transcribe_timestamped(
-        model,
-        audio_filename,
-        verbose=False,
-        fp16=False
-    )
+    def transcribe():
+        with use_model(model_size, device, compute) as model:
+            if parallel:
+                return transcribe_parallel(model, audio, TRANSCRIBE_OPTIONS, workers)
+            return transcribe_timestamped(model, audio, verbose=False, **TRANSCRIBE_OPTIONS)
+
+    whisper_result = cached_transcribe(key, transcribe)
 
     # 1️⃣ Trích xuất từ JSON script → chuỗi text
     script_text = extract_text_from_json(script_json)
@@ -64,34 +94,6 @@ def extract_text_from_json(script_json: dict) -> str:
     return all_text.strip()
 
 
-# =======================
-# SCRIPT → PHRASES
-# =======================
-
-def split_script_to_phrases(script_text):
-    """
-    Cắt script theo đúng nhịp đã viết cho TTS
-    """
-    script_text = unicodedata.normalize("NFC", script_text)
-
-    lines = []
-    for line in script_text.split("\n"):
-        parts = re.split(r"[.!?]", line)
-        for p in parts:
-            p = p.strip()
-            if p:
-                lines.append(p)
-
-    return lines
-
-
-def tokenize(text):
-    return re.findall(
-        r"[0-9A-Za-zÀ-ỹăâđêôơưĂÂÊÔƠƯĐà-ỹ]+",
-        text.lower()
-    )
-
-
 # =======================
 # WHISPER WORDS
 # =======================
@@ -109,68 +111,13 @@ def extract_whisper_words(analysis):
     return words
 
 
-# =======================
-# NORMALIZE
-# =======================
-
-WORD_FIX = {
-    "hách": "hack",
-    "trùng": "trùm",
-    "lau": "lao",
-    "hát": "hạt"
-}
-
-
-def normalize_word(word):
-    word = unicodedata.normalize("NFC", word)
-    word = re.sub(
-        r"[^0-9A-Za-zÀ-ỹăâđêôơưĂÂÊÔƠƯĐà-ỹ]",
-        "",
-        word
-    )
-    return WORD_FIX.get(word.lower(), word.lower())
-
-
 # =======================
 # ALIGN SCRIPT ↔ TIME
 # =======================
 
 def align_script_phrases_with_time(script_phrases, whisper_words):
-    captions = []
-    w_idx = 0
-
-    for phrase in script_phrases:
-        tokens = tokenize(phrase)
-        if not tokens:
-            continue
-
-        start_time = None
-        end_time = None
-        matched = 0
-
-        for i in range(w_idx, len(whisper_words)):
-            score = difflib.SequenceMatcher(
-                None,
-                whisper_words[i]["text"],
-                tokens[matched]
-            ).ratio()
-
-            if score > 0.7:
-                if start_time is None:
-                    start_time = whisper_words[i]["start"]
-                end_time = whisper_words[i]["end"]
-                matched += 1
-                w_idx = i + 1
-
-                if matched >= len(tokens):
-                    break
-
-        if start_time is None:
-            continue
-
-        captions.append((
-            (round(start_time, 2), round(end_time, 2)),
-            phrase
-        ))
-
-    return captions
+    """
+    Căn toàn cục script ↔ Whisper words (banded DP, xem alignment.py);
+    mốc câu lấy từ đường căn, không bỏ câu nào.
+    """
+    return align_phrases(script_phrases, whisper_words)
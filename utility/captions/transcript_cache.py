@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import numpy as np
+import whisper_timestamped
+from utility import disk_cache
+
+# =======================
+# CONFIG
+# =======================
+
+TRANSCRIPT_NAMESPACE = "transcripts"
+TRANSCRIPT_VERSION = 1       # tăng khi đổi cách lưu / options mặc định
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+
+
+# =======================
+# KEY
+# =======================
+
+def audio_fingerprint(audio):
+    """sha256 of the decoded 16 kHz mono samples: same speech, same key, whatever the container."""
+    return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).tobytes()).hexdigest()
+
+
+def transcript_key(audio, model_key, options):
+    return disk_cache.make_key(
+        "transcript", TRANSCRIPT_VERSION, getattr(whisper_timestamped, "__version__", None),
+        audio_fingerprint(audio), list(model_key), options
+    )
+
+
+# =======================
+# LOOKUP / STORE
+# =======================
+
+def load_transcript(key):
+    path = disk_cache.lookup(TRANSCRIPT_NAMESPACE, key, ".json")
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store_transcript(key, result):
+    data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+    disk_cache.store_bytes(TRANSCRIPT_NAMESPACE, key, data, ".json", TRANSCRIPT_CACHE_MAX_BYTES)
+
+
+def cached_transcribe(key, transcribe):
+    """Raw transcribe_timestamped result for key, running transcribe() only on a miss."""
+    result = load_transcript(key)
+    if result is not None:
+        return result
+    with disk_cache.key_lock(TRANSCRIPT_NAMESPACE, key):
+        result = load_transcript(key)
+        if result is None:
+            result = transcribe()
+            store_transcript(key, result)
+    return result
+
+
+def get_transcript_cache_stats():
+    return disk_cache.get_cache_stats(TRANSCRIPT_NAMESPACE)
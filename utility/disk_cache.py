@@ -0,0 +1,230 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from filelock import FileLock, Timeout
+
+# =======================
+# CACHE CONFIG
+# =======================
+CACHE_ROOT = os.environ.get("TTV_CACHE_DIR", ".cache")
+# an entry looked up / opened within this many seconds counts as in use by
+# some render (this or another process); long renders renew it (see leased)
+LEASE_SECONDS = float(os.environ.get("TTV_CACHE_LEASE_SECONDS", 300))
+# leased entries may keep a namespace above max_bytes, but never above this factor
+MAX_OVERSHOOT = float(os.environ.get("TTV_CACHE_MAX_OVERSHOOT", 1.5))
+LOCK_SUFFIX = ".lock"
+PART_PREFIX = ".part-"
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+# =======================
+# KEYS & PATHS
+# =======================
+def make_key(*parts):
+    """Stable sha256 key for any JSON-serialisable parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_dir(namespace):
+    path = os.path.join(CACHE_ROOT, namespace)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_path(namespace, key, suffix=""):
+    return os.path.join(cache_dir(namespace), key + suffix)
+
+
+def key_lock(namespace, key, timeout=-1):
+    """Inter-process lock for one entry, e.g. to avoid duplicate downloads."""
+    return FileLock(cache_path(namespace, key, LOCK_SUFFIX), timeout=timeout)
+
+
+# =======================
+# HIT / MISS COUNTERS
+# =======================
+def _count(namespace, field, n=1):
+    with _stats_lock:
+        ns = _stats.setdefault(namespace, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0})
+        ns[field] += n
+
+
+def get_cache_stats(namespace=None):
+    """Counters for this process: {namespace: {hits, misses, writes, evictions}}."""
+    with _stats_lock:
+        if namespace is not None:
+            return dict(_stats.get(namespace, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}))
+        return {ns: dict(values) for ns, values in _stats.items()}
+
+
+# =======================
+# READ
+# =======================
+def lookup(namespace, key, suffix="", count=True):
+    """
+    Return the cached file path or None. A hit refreshes the entry's LRU
+    position and starts its lease (see LEASE_SECONDS).
+    """
+    path = cache_path(namespace, key, suffix)
+    try:
+        os.utime(path, None)
+    except OSError:
+        if count:
+            _count(namespace, "misses")
+        return None
+    if count:
+        _count(namespace, "hits")
+    return path
+
+
+def touch(path):
+    """Renew the lease of a cache entry right before it is (re)opened; other paths are left alone."""
+    root = os.path.abspath(CACHE_ROOT) + os.sep
+    if not os.path.abspath(path).startswith(root):
+        return
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+@contextmanager
+def leased(paths=()):
+    """
+    Keep the leases of cache entries alive while the block runs, e.g. for a
+    whole render whose readers open their files long after the lookup.
+    Yields the set of paths; more can be added to it inside the block.
+    """
+    paths = set(paths)
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(LEASE_SECONDS / 3):
+            for path in list(paths):
+                touch(path)
+
+    thread = threading.Thread(target=renew, name="cache-lease", daemon=True)
+    thread.start()
+    try:
+        yield paths
+    finally:
+        stop.set()
+        thread.join()
+
+
+# =======================
+# ATOMIC WRITE
+# =======================
+def reserve_temp(namespace, suffix=""):
+    """Temp path inside the namespace (ignored by eviction until committed)."""
+    fd, tmp_path = tempfile.mkstemp(prefix=PART_PREFIX, suffix=suffix, dir=cache_dir(namespace))
+    os.close(fd)
+    return tmp_path
+
+
+def commit(namespace, key, tmp_path, suffix="", max_bytes=None):
+    """Rename a finished temp file into place in one step."""
+    final_path = cache_path(namespace, key, suffix)
+    os.replace(tmp_path, final_path)
+    _count(namespace, "writes")
+    if max_bytes is not None:
+        evict(namespace, max_bytes, keep=(final_path,))
+    return final_path
+
+
+@contextmanager
+def atomic_write(namespace, key, suffix="", max_bytes=None):
+    """
+    Yield a temp path in the cache directory. When the block succeeds the
+    file is renamed into place in one step, so concurrent readers never see
+    a partial entry; on error the temp file is dropped.
+    """
+    tmp_path = reserve_temp(namespace, suffix)
+    try:
+        yield tmp_path
+        commit(namespace, key, tmp_path, suffix, max_bytes)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def store_bytes(namespace, key, data, suffix="", max_bytes=None):
+    with atomic_write(namespace, key, suffix, max_bytes) as tmp_path:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    return cache_path(namespace, key, suffix)
+
+
+# =======================
+# LRU EVICTION
+# =======================
+def _remove_entry(path):
+    """Delete an entry and its key_lock file (unless someone holds that lock right now)."""
+    os.remove(path)
+    lock_path = os.path.splitext(path)[0] + LOCK_SUFFIX
+    if not os.path.exists(lock_path):
+        return
+    try:
+        with FileLock(lock_path, timeout=0):
+            os.remove(lock_path)
+    except (OSError, Timeout):
+        pass
+
+
+def evict(namespace, max_bytes, keep=()):
+    """
+    Delete least recently used entries until the namespace fits max_bytes.
+    Entries still under lease (used within LEASE_SECONDS) are skipped first,
+    so a render that looked a path up earlier can still open it. If leases
+    alone keep the namespace above max_bytes * MAX_OVERSHOOT, the oldest
+    leased entries go too, down to that hard cap.
+    """
+    directory = cache_dir(namespace)
+    keep = {os.path.abspath(p) for p in keep}
+    leased_after = time.time() - LEASE_SECONDS
+
+    with FileLock(os.path.join(directory, "evict" + LOCK_SUFFIX)):
+        entries = []
+        total = 0
+        for name in os.listdir(directory):
+            if name.endswith(LOCK_SUFFIX) or name.startswith(PART_PREFIX):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            total += st.st_size
+            entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        removed = 0
+        forced = 0
+        for limit, skip_leased in ((max_bytes, True), (max_bytes * MAX_OVERSHOOT, False)):
+            remaining = []
+            for mtime, size, path in entries:
+                if total <= limit or os.path.abspath(path) in keep or (skip_leased and mtime >= leased_after):
+                    remaining.append((mtime, size, path))
+                    continue
+                try:
+                    _remove_entry(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                forced += not skip_leased
+            entries = remaining
+
+    if forced:
+        print(f"Cache '{namespace}': evicted {forced} leased entries to stay under "
+              f"{MAX_OVERSHOOT:g}x its {max_bytes} byte cap")
+    if removed:
+        _count(namespace, "evictions", removed)
+    return removed
@@ -0,0 +1,72 @@
+import os
+from urllib.parse import urlparse
+from utility import disk_cache
+from utility.render.downloader import download_file
+
+# ----------------------
+# ASSET CACHE CONFIG
+# ----------------------
+ASSET_CACHE_NAMESPACE = "assets"
+ASSET_CACHE_MAX_BYTES = int(os.environ.get("ASSET_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+
+DEFAULT_SUFFIX = {
+    "video": ".mp4",
+    "image": ".jpg",
+}
+
+
+# ----------------------
+# KEY
+# ----------------------
+def asset_base_url(url):
+    return url.split("?")[0]
+
+
+def asset_identity(url, media_type=None):
+    """
+    Pexels video renditions differ by path (their query string only carries
+    signatures), but photo renditions differ only by query: large2x and
+    original share one base URL. Stills are therefore keyed on the full URL,
+    so a preview download is never reused by the final render or vice versa.
+    """
+    if media_type == "image":
+        return url
+    return asset_base_url(url)
+
+
+def asset_suffix(url, media_type):
+    ext = os.path.splitext(urlparse(asset_base_url(url)).path)[1].lower()
+    if ext and len(ext) <= 5:
+        return ext
+    return DEFAULT_SUFFIX.get(media_type, "")
+
+
+# ----------------------
+# FETCH (CACHE FIRST)
+# ----------------------
+def fetch_asset(url, media_type=None, max_bytes=ASSET_CACHE_MAX_BYTES):
+    """
+    Return a local path for a Pexels asset, downloading it only when it is
+    not in the persistent cache yet. Cached files must not be deleted by
+    callers.
+    """
+    key = disk_cache.make_key(asset_identity(url, media_type))
+    suffix = asset_suffix(url, media_type)
+
+    path = disk_cache.lookup(ASSET_CACHE_NAMESPACE, key, suffix)
+    if path:
+        return path
+
+    # another render process may be downloading the same asset right now
+    with disk_cache.key_lock(ASSET_CACHE_NAMESPACE, key):
+        path = disk_cache.lookup(ASSET_CACHE_NAMESPACE, key, suffix, count=False)
+        if path:
+            return path
+        with disk_cache.atomic_write(ASSET_CACHE_NAMESPACE, key, suffix, max_bytes) as tmp_path:
+            download_file(url, tmp_path, media_type)
+
+    return disk_cache.cache_path(ASSET_CACHE_NAMESPACE, key, suffix)
+
+
+def get_asset_cache_stats():
+    return disk_cache.get_cache_stats(ASSET_CACHE_NAMESPACE)
@@ -0,0 +1,138 @@
+import os
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from utility import disk_cache
+
+# ----------------------
+# CAPTION STYLE
+# ----------------------
+# must cover Vietnamese (ề, ấ, ể, ố, ủ, ...): DejaVuSansMono shows boxes for many of them
+CAPTION_FONT = os.environ.get("CAPTION_FONT", "DejaVuSans.ttf")
+CAPTION_FONTSIZE = 40
+CAPTION_COLOR = "white"
+CAPTION_STROKE_COLOR = "black"
+CAPTION_STROKE_WIDTH = 2
+CAPTION_REFERENCE_WIDTH = 1080   # output frame width the style above is tuned for
+CAPTION_MARGIN = 60              # px each side at the reference width
+CAPTION_WIDTH = CAPTION_REFERENCE_WIDTH - 2 * CAPTION_MARGIN   # wrap width, never wider than the frame
+
+CAPTION_CACHE_NAMESPACE = "captions"
+CAPTION_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+
+# ----------------------
+# FONT CACHE
+# ----------------------
+@lru_cache(maxsize=32)
+def load_font(font, fontsize):
+    try:
+        return ImageFont.truetype(font, fontsize)
+    except OSError as e:
+        # không fallback sang font mặc định của Pillow: nó cũng thiếu chữ tiếng Việt
+        raise RuntimeError(
+            f"Caption font '{font}' not found; install it (e.g. fonts-dejavu-core) "
+            f"or point CAPTION_FONT at a .ttf with Vietnamese glyphs"
+        ) from e
+
+
+# ----------------------
+# WORD WRAP (same greedy rule as ImageMagick caption:)
+# ----------------------
+def wrap_text(text, font, max_width, stroke_width=0):
+    lines = []
+    for paragraph in text.split("\n"):
+        current = ""
+        for word in paragraph.split():
+            candidate = f"{current} {word}" if current else word
+            if current and font.getlength(candidate) + 2 * stroke_width > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+
+# ----------------------
+# RASTERIZE CAPTION → RGBA
+# ----------------------
+@lru_cache(maxsize=1024)
+def render_caption(text, font=CAPTION_FONT, fontsize=CAPTION_FONTSIZE, color=CAPTION_COLOR,
+                   stroke_color=CAPTION_STROKE_COLOR, stroke_width=CAPTION_STROKE_WIDTH,
+                   width=CAPTION_WIDTH):
+    """
+    Render a caption the way TextClip(method="caption", size=(width, None),
+    align="center") lays it out: words wrapped to width, lines centered,
+    height fitted to the text. Returns a read-only (h, width, 4) uint8 array
+    that is shared between callers with the same arguments.
+    """
+    pil_font = load_font(font, fontsize)
+    lines = wrap_text(text, pil_font, width, stroke_width)
+
+    ascent, descent = pil_font.getmetrics()
+    line_height = ascent + descent + 2 * stroke_width
+    height = max(1, line_height * len(lines))
+
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        line_width = pil_font.getlength(line)
+        x = (width - line_width) / 2
+        y = i * line_height + stroke_width
+        draw.text((x, y), line, font=pil_font, fill=color,
+                  stroke_width=stroke_width, stroke_fill=stroke_color)
+
+    array = np.asarray(image)
+    array.setflags(write=False)
+    return array
+
+
+# ----------------------
+# STYLE FOR OTHER OUTPUT SIZES
+# ----------------------
+def caption_style_for(size):
+    """
+    render_caption kwargs that keep the caption look at another output width;
+    the wrap width follows the frame so the centered overlay is never cropped.
+    """
+    scale = size[0] / CAPTION_REFERENCE_WIDTH
+    if scale == 1:
+        return {}
+    return {
+        "fontsize": max(1, round(CAPTION_FONTSIZE * scale)),
+        "stroke_width": max(1, round(CAPTION_STROKE_WIDTH * scale)),
+        "width": max(1, round(CAPTION_WIDTH * scale)),
+    }
+
+
+def resolved_caption_style(style=None):
+    """Every argument that affects render_caption's pixels (for fingerprints)."""
+    resolved = {
+        "font": CAPTION_FONT,
+        "fontsize": CAPTION_FONTSIZE,
+        "color": CAPTION_COLOR,
+        "stroke_color": CAPTION_STROKE_COLOR,
+        "stroke_width": CAPTION_STROKE_WIDTH,
+        "width": CAPTION_WIDTH,
+    }
+    resolved.update(style or {})
+    return resolved
+
+
+# ----------------------
+# CAPTION → PNG (for the ffmpeg backend)
+# ----------------------
+def render_caption_png(text, **style):
+    """Rendered caption as a cached PNG file path, same layout as render_caption."""
+    key = disk_cache.make_key("caption", text, resolved_caption_style(style))
+    path = disk_cache.lookup(CAPTION_CACHE_NAMESPACE, key, ".png")
+    if path:
+        return path
+    with disk_cache.atomic_write(CAPTION_CACHE_NAMESPACE, key, ".png", CAPTION_CACHE_MAX_BYTES) as tmp_path:
+        Image.fromarray(render_caption(text, **style)).save(tmp_path, format="PNG")
+    return disk_cache.cache_path(CAPTION_CACHE_NAMESPACE, key, ".png")
+
+
+def get_caption_cache_info():
+    return render_caption.cache_info()
@@ -0,0 +1,161 @@
+import os
+import threading
+from collections import OrderedDict
+from moviepy.editor import VideoClip
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader, ffmpeg_parse_infos
+from utility import disk_cache
+from utility.render.image_segments import load_image_fitted
+
+# ----------------------
+# READER POOL CONFIG
+# ----------------------
+MAX_OPEN_READERS = int(os.environ.get("MAX_OPEN_READERS", 8))
+MAX_READER_BYTES = int(os.environ.get("MAX_READER_BYTES", 1536 * 1024 ** 2))
+READER_LOOKAHEAD = 0.5   # seconds before a segment starts to open its reader
+
+
+# ----------------------
+# READER POOL
+# ----------------------
+class ReaderPool:
+    """
+    Bounds how many lazy clips hold an open resource (ffmpeg reader
+    subprocess or decoded still) and how many frame bytes they keep
+    resident. Over either cap the least recently used resource is closed;
+    it is reopened transparently if that clip is asked for a frame again.
+    """
+
+    def __init__(self, max_open=MAX_OPEN_READERS, max_bytes=MAX_READER_BYTES):
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self._open = OrderedDict()   # id(clip) → (clip, bytes)
+        self._lock = threading.RLock()
+        self.peak_open = 0
+        self.peak_bytes = 0
+
+    @property
+    def open_bytes(self):
+        return sum(n for _, n in self._open.values())
+
+    def acquire(self, clip):
+        with self._lock:
+            key = id(clip)
+            if key in self._open:
+                self._open.move_to_end(key)
+                return
+            nbytes = clip.resident_bytes()
+            while self._open and (len(self._open) >= self.max_open
+                                  or self.open_bytes + nbytes > self.max_bytes):
+                _, (victim, _) = self._open.popitem(last=False)
+                victim.close_resource()
+            clip.open_resource()
+            self._open[key] = (clip, nbytes)
+            self.peak_open = max(self.peak_open, len(self._open))
+            self.peak_bytes = max(self.peak_bytes, self.open_bytes)
+
+    def release(self, clip):
+        with self._lock:
+            if self._open.pop(id(clip), None) is not None:
+                clip.close_resource()
+
+    def close_all(self):
+        with self._lock:
+            while self._open:
+                _, (clip, _) = self._open.popitem()
+                clip.close_resource()
+
+    def stats(self):
+        with self._lock:
+            return {"open": len(self._open), "open_bytes": self.open_bytes,
+                    "peak_open": self.peak_open, "peak_bytes": self.peak_bytes}
+
+
+READER_POOL = ReaderPool()
+
+
+# ----------------------
+# LAZY CLIPS
+# ----------------------
+class LazyClipMixin:
+    """
+    prepare()/release() are called by the compositor around the active range.
+    make_frame is a method (not an instance attribute) so that the copies
+    made by set_start/set_end own their resource.
+    """
+
+    def prepare(self):
+        self.pool.acquire(self)
+
+    def release(self):
+        self.pool.release(self)
+
+    def close(self):
+        self.release()
+
+
+class LazyVideoFileClip(LazyClipMixin, VideoClip):
+    """
+    VideoFileClip without audio whose ffmpeg reader only exists while the
+    clip is (about to be) on screen. `offset` starts playback inside the
+    file, replacing subclip() so the reader stays owned by this clip.
+    """
+
+    def __init__(self, filename, offset=0.0, pool=None):
+        VideoClip.__init__(self)
+        infos = ffmpeg_parse_infos(filename)
+        self.filename = filename
+        self.offset = offset
+        self.pool = pool or READER_POOL
+        self.size = tuple(infos["video_size"])
+        self.fps = infos["video_fps"]
+        self.duration = max(0.0, infos["duration"] - offset)
+        self.end = self.duration
+        self.reader = None
+
+    def resident_bytes(self):
+        # last decoded frame + ffmpeg pipe buffer of one frame
+        w, h = self.size
+        return 2 * 3 * w * h
+
+    def open_resource(self):
+        if self.reader is None:
+            disk_cache.touch(self.filename)
+            self.reader = FFMPEG_VideoReader(self.filename, pix_fmt="rgb24")
+
+    def close_resource(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def make_frame(self, t):
+        self.pool.acquire(self)
+        return self.reader.get_frame(t + self.offset)
+
+
+class LazyImageClip(LazyClipMixin, VideoClip):
+    """Still image fitted to size, decoded only while the clip is active."""
+
+    def __init__(self, filename, size, duration, pool=None):
+        VideoClip.__init__(self)
+        self.filename = filename
+        self.pool = pool or READER_POOL
+        self.size = tuple(size)
+        self.duration = duration
+        self.end = duration
+        self.img = None
+
+    def resident_bytes(self):
+        w, h = self.size
+        return 3 * w * h
+
+    def open_resource(self):
+        if self.img is None:
+            disk_cache.touch(self.filename)
+            self.img = load_image_fitted(self.filename, self.size)
+
+    def close_resource(self):
+        self.img = None
+
+    def make_frame(self, t):
+        self.pool.acquire(self)
+        return self.img
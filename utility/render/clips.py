@@ -0,0 +1,33 @@
+from moviepy.editor import ColorClip, ImageClip
+from utility.render.caption_renderer import render_caption
+from utility.render.clip_pool import LazyImageClip, LazyVideoFileClip
+
+# ----------------------
+# CAPTION CLIP (IN-PROCESS, NO IMAGEMAGICK)
+# ----------------------
+def make_caption_clip(text, t1, t2, style=None):
+    rgba = render_caption(text, **(style or {}))
+    return ImageClip(rgba).set_start(t1).set_end(t2).set_position(("center", "bottom"))
+
+
+# ----------------------
+# BACKGROUND MEDIA CLIP
+# ----------------------
+def make_media_clip(path, media_type, t1, t2, offset=0.0, size=None):
+    """Background clip whose reader/decoded still only lives while it is on screen."""
+    if media_type == 'video':
+        clip = LazyVideoFileClip(path, offset)
+    elif size:
+        # decode at reduced resolution and fit to the frame, only while active
+        clip = LazyImageClip(path, size, duration=t2 - t1)
+    else:
+        # convert image to video clip with duration
+        clip = ImageClip(path, duration=t2 - t1)
+    return clip.set_start(t1).set_end(t2)
+
+
+def make_segment_clip(seg, size):
+    """Clip for one timeline segment (see timeline.build_timeline), black for gaps."""
+    if seg["type"] == "gap":
+        return ColorClip(size, color=(0, 0, 0), duration=seg["end"] - seg["start"]).set_start(seg["start"])
+    return make_media_clip(seg["path"], seg["type"], seg["start"], seg["end"], seg["offset"], size)
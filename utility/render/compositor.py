@@ -0,0 +1,197 @@
+import numpy as np
+from moviepy.editor import CompositeAudioClip, ImageClip, VideoClip
+from utility.render.clip_pool import READER_LOOKAHEAD
+
+# ----------------------
+# POSITION (same rules as moviepy Clip.blit_on)
+# ----------------------
+POSITION_SHORTCUTS = {
+    'center': ['center', 'center'],
+    'left': ['left', 'center'],
+    'right': ['right', 'center'],
+    'top': ['center', 'top'],
+    'bottom': ['center', 'bottom'],
+}
+
+
+def resolve_position(clip, ct, frame_size, layer_size):
+    wf, hf = frame_size
+    wi, hi = layer_size
+    pos = clip.pos(ct)
+    pos = list(POSITION_SHORTCUTS[pos]) if isinstance(pos, str) else list(pos)
+
+    if clip.relative_pos:
+        for i, dim in enumerate([wf, hf]):
+            if not isinstance(pos[i], str):
+                pos[i] = dim * pos[i]
+    if isinstance(pos[0], str):
+        pos[0] = {'left': 0, 'center': (wf - wi) / 2, 'right': wf - wi}[pos[0]]
+    if isinstance(pos[1], str):
+        pos[1] = {'top': 0, 'center': (hf - hi) / 2, 'bottom': hf - hi}[pos[1]]
+    return int(pos[0]), int(pos[1])
+
+
+def clip_box(x, y, wi, hi, wf, hf):
+    """Visible part of a wi x hi layer at (x, y): (frame slice, layer slice) or None."""
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + wi, wf), min(y + hi, hf)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return (
+        (slice(y1, y2), slice(x1, x2)),
+        (slice(y1 - y, y2 - y), slice(x1 - x, x2 - x)),
+    )
+
+
+# ----------------------
+# BUFFERED COMPOSITE CLIP
+# ----------------------
+class BufferedCompositeVideoClip(VideoClip):
+    """
+    Drop-in for moviepy's CompositeVideoClip(clips, size, bg_color) that
+    composites into preallocated frame buffers:
+
+    - layers outside their [start, end) are skipped before any decode;
+    - opaque layers are copied, masked layers (captions) are blended only
+      inside their bounding box, with the alpha terms of static ImageClips
+      computed once;
+    - the returned frame is one of two reused uint8 buffers (no per-frame
+      allocation, no astype in iter_frames), valid until the next-but-one
+      get_frame call;
+    - lazy clips (clip_pool) get prepare() READER_LOOKAHEAD seconds before
+      they start and release() once they end, so only the readers around
+      the playhead are open.
+    """
+
+    def __init__(self, clips, size=None, bg_color=None):
+        if size is None:
+            size = clips[0].size
+        if bg_color is None:
+            bg_color = (0, 0, 0)
+
+        VideoClip.__init__(self)
+        self.clips = clips
+        self.size = tuple(size)
+        self.bg_color = np.array(bg_color, dtype=np.uint8)
+
+        ends = [c.end for c in clips]
+        if None not in ends:
+            self.duration = max(ends)
+            self.end = self.duration
+
+        fpss = [c.fps for c in clips if getattr(c, 'fps', None)]
+        if fpss:
+            self.fps = max(fpss)
+
+        audioclips = [c.audio.set_start(c.start) for c in clips if c.audio is not None]
+        if audioclips:
+            self.audio = CompositeAudioClip(audioclips)
+
+        w, h = self.size
+        self._buffers = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(2)]
+        self._next_buffer = 0
+        self._static_layers = {}   # id(clip) → (box, premultiplied rgb, 1 - alpha)
+        self._scratch = {}         # bbox shape → float32 work array
+
+        self.make_frame = self.composite_frame
+
+    # ----------------------
+    # HELPERS
+    # ----------------------
+    def _scratch_for(self, shape):
+        arr = self._scratch.get(shape)
+        if arr is None:
+            arr = self._scratch[shape] = np.empty(shape, dtype=np.float32)
+        return arr
+
+    def _static_layer(self, clip, box, img):
+        """Premultiplied colour and inverse alpha of a still masked layer, cached."""
+        key = id(clip)
+        cached = self._static_layers.get(key)
+        if cached is not None and cached[0] == box:
+            return cached[1], cached[2]
+        _, layer_slice = box
+        alpha = clip.mask.get_frame(0)[layer_slice][:, :, None].astype(np.float32)
+        premult = img[layer_slice].astype(np.float32) * alpha + 0.5
+        inv_alpha = 1.0 - alpha
+        self._static_layers[key] = (box, premult, inv_alpha)
+        return premult, inv_alpha
+
+    def _blend(self, region, img, alpha):
+        scratch = self._scratch_for(region.shape)
+        np.multiply(region, 1.0 - alpha, out=scratch)
+        scratch += img * alpha
+        scratch += 0.5
+        np.copyto(region, scratch, casting='unsafe')
+
+    def _manage_lifecycle(self, t):
+        for clip in self.clips:
+            if not hasattr(clip, "prepare"):
+                continue
+            if clip.end is not None and t >= clip.end:
+                clip.release()
+            elif clip.start - READER_LOOKAHEAD <= t < clip.start:
+                clip.prepare()
+
+    # ----------------------
+    # FRAME
+    # ----------------------
+    def composite_frame(self, t):
+        self._manage_lifecycle(t)
+        buf = self._buffers[self._next_buffer]
+        self._next_buffer ^= 1
+        hf, wf = buf.shape[:2]
+
+        active = [c for c in self.clips if c.is_playing(t)]
+        covered = False
+
+        for clip in active:
+            ct = t - clip.start
+
+            if clip.ismask or (clip.mask is not None and clip.mask.size != clip.size):
+                # unusual layers: let moviepy do it
+                if not covered:
+                    buf[:] = self.bg_color
+                    covered = True
+                np.copyto(buf, clip.blit_on(buf, t), casting='unsafe')
+                continue
+
+            img = clip.get_frame(ct)
+            hi, wi = img.shape[:2]
+            x, y = resolve_position(clip, ct, (wf, hf), (wi, hi))
+            box = clip_box(x, y, wi, hi, wf, hf)
+            if box is None:
+                continue
+            frame_slice, layer_slice = box
+
+            if clip.mask is None:
+                full = frame_slice[0] == slice(0, hf) and frame_slice[1] == slice(0, wf)
+                if not covered and not full:
+                    buf[:] = self.bg_color
+                np.copyto(buf[frame_slice], img[layer_slice][:, :, :3], casting='unsafe')
+                covered = True
+                continue
+
+            if not covered:
+                buf[:] = self.bg_color
+                covered = True
+            region = buf[frame_slice]
+            if isinstance(clip, ImageClip) and isinstance(clip.mask, ImageClip):
+                premult, inv_alpha = self._static_layer(clip, box, img)
+                scratch = self._scratch_for(region.shape)
+                np.multiply(region, inv_alpha, out=scratch)
+                scratch += premult
+                np.copyto(region, scratch, casting='unsafe')
+            else:
+                alpha = clip.mask.get_frame(ct)[layer_slice][:, :, None]
+                self._blend(region, img[layer_slice][:, :, :3], alpha)
+
+        if not covered:
+            buf[:] = self.bg_color
+        return buf
+
+    def close(self):
+        for clip in self.clips:
+            clip.close()
+        self._static_layers.clear()
+        self._scratch.clear()
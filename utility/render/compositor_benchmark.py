@@ -0,0 +1,123 @@
+"""
+Micro-benchmark: MoviePy's CompositeVideoClip vs BufferedCompositeVideoClip,
+and FFMPEG_VideoWriter.write_frame vs write_frame_nocopy.
+
+    python -m utility.render.compositor_benchmark
+    python -m utility.render.compositor_benchmark --video a.mp4 --video b.mp4
+
+Timeline: 6 s at 1080x1920 / 25 fps, two 3 s background videos (the
+all-intra proxies the renderer uses, generated with ffmpeg's testsrc2 unless
+--video is given) and 12 captions of 0.5 s. Every frame is composited once;
+reports frames per second and the peak traced allocation (tracemalloc) of
+that loop, then the peak allocation of feeding one second of composited
+frames to an encoder.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from moviepy.editor import CompositeVideoClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from utility.render.clips import make_caption_clip, make_media_clip
+from utility.render.clip_pool import READER_POOL
+from utility.render.compositor import BufferedCompositeVideoClip
+from utility.render.ffmpeg_utils import run_ffmpeg
+from utility.render.multi_output import write_frame_nocopy
+from utility.render.proxy import PROXY_CODEC_ARGS
+
+SIZE = (1080, 1920)
+FPS = 25
+SEGMENT_SECONDS = 3.0
+N_SEGMENTS = 2
+N_CAPTIONS = 12
+CAPTION_SECONDS = 0.5
+DURATION = SEGMENT_SECONDS * N_SEGMENTS
+
+
+def make_test_videos(directory):
+    paths = []
+    for i in range(N_SEGMENTS):
+        path = os.path.join(directory, f"segment_{i}.mp4")
+        run_ffmpeg([
+            "-f", "lavfi", "-i", f"testsrc2=s={SIZE[0]}x{SIZE[1]}:r={FPS}:d={SEGMENT_SECONDS}",
+            *PROXY_CODEC_ARGS, path,
+        ])
+        paths.append(path)
+    return paths
+
+
+def make_layers(videos):
+    layers = [
+        make_media_clip(videos[i % len(videos)], "video", i * SEGMENT_SECONDS, (i + 1) * SEGMENT_SECONDS)
+        for i in range(N_SEGMENTS)
+    ]
+    layers += [
+        make_caption_clip(f"Xin chào các bạn {i}", i * CAPTION_SECONDS, (i + 1) * CAPTION_SECONDS)
+        for i in range(N_CAPTIONS)
+    ]
+    return layers
+
+
+def frame_times():
+    return [i / FPS for i in range(int(DURATION * FPS))]
+
+
+def measure(make_clip, videos):
+    clip = make_clip(make_layers(videos))
+    tracemalloc.start()
+    started = time.perf_counter()
+    for t in frame_times():
+        clip.get_frame(t)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    clip.close()
+    READER_POOL.close_all()
+    return len(frame_times()) / seconds, peak
+
+
+def measure_writer(write, videos):
+    clip = BufferedCompositeVideoClip(make_layers(videos), size=SIZE)
+    frames = [np.array(clip.get_frame(t)) for t in frame_times()[:FPS]]
+    clip.close()
+    READER_POOL.close_all()
+    writer = FFMPEG_VideoWriter(os.devnull, SIZE, FPS, codec="rawvideo", ffmpeg_params=["-f", "null"])
+    try:
+        tracemalloc.start()
+        for frame in frames:
+            write(writer, frame)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        writer.close()
+    return peak
+
+
+def main(videos=None):
+    mb = 1024 ** 2
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        videos = videos or make_test_videos(tmp_dir)
+        print(f"{DURATION:g} s {SIZE[0]}x{SIZE[1]} @ {FPS} fps, {N_SEGMENTS} videos, {N_CAPTIONS} captions")
+        print(f"{'compositor':>28} {'fps':>7} {'peak MB':>8}")
+        for name, make_clip in (
+            ("CompositeVideoClip", lambda layers: CompositeVideoClip(layers, size=SIZE)),
+            ("BufferedCompositeVideoClip", lambda layers: BufferedCompositeVideoClip(layers, size=SIZE)),
+        ):
+            fps, peak = measure(make_clip, videos)
+            print(f"{name:>28} {fps:>7.1f} {peak / mb:>8.1f}")
+
+        print(f"{'encoder feed (1 s)':>28} {'peak MB':>8}")
+        for name, write in (
+            ("write_frame (tobytes)", lambda writer, frame: writer.write_frame(frame)),
+            ("write_frame_nocopy", write_frame_nocopy),
+        ):
+            print(f"{name:>28} {measure_writer(write, videos) / mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compositor / encoder feed benchmark.")
+    parser.add_argument("--video", action="append", default=None,
+                        help="background video (repeatable) instead of generated test videos")
+    main(parser.parse_args().video)
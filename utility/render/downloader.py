@@ -0,0 +1,113 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+
+# ----------------------
+# DOWNLOAD CONFIG
+# ----------------------
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", 8))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = (10, 60)      # (connect, read) seconds
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0"
+}
+
+# content-type prefixes accepted for each media type
+ACCEPTED_CONTENT_TYPES = {
+    "video": ("video/", "application/octet-stream"),
+    "image": ("image/", "application/octet-stream"),
+}
+
+
+# ----------------------
+# INTEGRITY CHECKS
+# ----------------------
+def check_content_type(response, media_type):
+    if media_type not in ACCEPTED_CONTENT_TYPES:
+        return
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith(ACCEPTED_CONTENT_TYPES[media_type]):
+        raise RuntimeError(f"Unexpected content-type '{content_type}' for {media_type}")
+
+
+def check_size(written, response):
+    if written == 0:
+        raise RuntimeError("Downloaded file is empty")
+    expected = response.headers.get("Content-Length")
+    # Content-Length is the encoded size when the body is compressed
+    if expected and not response.headers.get("Content-Encoding") and int(expected) != written:
+        raise RuntimeError(f"Size mismatch: expected {expected} bytes, got {written}")
+
+
+# ----------------------
+# DOWNLOAD FILE (STREAMED)
+# ----------------------
+def download_file(url, filename, media_type=None, retries=DOWNLOAD_RETRIES):
+    """
+    Stream url to filename in chunks. The file only appears under its
+    final name once size and content-type checks have passed.
+    """
+    part_filename = filename + ".part"
+    last_error = None
+
+    for attempt in range(retries):
+        try:
+            with requests.get(url, headers=DOWNLOAD_HEADERS, stream=True,
+                              timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                if response.status_code != 200:
+                    # client errors will not fix themselves, do not retry
+                    raise ValueError(f"HTTP {response.status_code} for {url}")
+                check_content_type(response, media_type)
+
+                written = 0
+                with open(part_filename, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                check_size(written, response)
+
+            os.replace(part_filename, filename)
+            return filename
+        except ValueError:
+            raise
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            last_error = e
+            if attempt < retries - 1:
+                time.sleep(1.5 * (attempt + 1))
+        finally:
+            if os.path.exists(part_filename):
+                os.remove(part_filename)
+
+    raise RuntimeError(f"Download failed after {retries} attempts: {url} ({last_error})")
+
+
+# ----------------------
+# PARALLEL DOWNLOAD STAGE
+# ----------------------
+def iter_downloads(jobs, fetch=download_file, workers=DOWNLOAD_WORKERS):
+    """
+    jobs = [(key, (fetch args...)), ...]
+
+    Run fetch for every job on a bounded thread pool and yield
+    (key, path, error) in completion order, so callers can start
+    working on a file as soon as it lands.
+    """
+    if not jobs:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+        futures = {
+            executor.submit(fetch, *args): key
+            for key, args in jobs
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
@@ -0,0 +1,129 @@
+from utility.audio.audio_asset import ffmpeg_audio_input
+from utility.render.ffmpeg_utils import run_ffmpeg
+from utility.render.caption_renderer import render_caption_png
+from utility.render.image_segments import fitted_still_path
+from utility.render.timeline import frame_count
+
+# ----------------------
+# FILTER HELPERS
+# ----------------------
+def normalize_filter(size, fps):
+    """fps + cover-scale + center-crop to the output frame."""
+    w, h = size
+    return (
+        f"fps={fps},"
+        f"scale={w}:{h}:force_original_aspect_ratio=increase,"
+        f"crop={w}:{h},setsar=1,format=yuv420p"
+    )
+
+
+def segment_input_args(seg, fps):
+    """ffmpeg input options for one timeline segment (None for gaps)."""
+    if seg["type"] == "gap":
+        return None
+    if seg["type"] == "image":
+        duration = seg["end"] - seg["start"] + 1
+        return ["-loop", "1", "-framerate", fps, "-t", f"{duration:.3f}", "-i", seg["path"]]
+    return ["-ss", f"{seg['offset']:.3f}", "-i", seg["path"]]
+
+
+def segment_filter(input_label, seg, size, fps):
+    """Filter chain producing exactly the segment's frames at output geometry."""
+    nframes = frame_count(seg["start"], seg["end"], fps)
+    if seg["type"] == "gap":
+        w, h = size
+        return f"color=c=black:s={w}x{h}:r={fps},trim=end_frame={nframes},setsar=1,format=yuv420p"
+    # a source shorter than its slot holds the last frame, like MoviePy does
+    return (
+        f"[{input_label}]setpts=PTS-STARTPTS,{normalize_filter(size, fps)},"
+        f"tpad=stop_mode=clone:stop={nframes},trim=end_frame={nframes},setpts=PTS-STARTPTS"
+    )
+
+
+def caption_overlay_expr(t1, t2):
+    # active on [t1, t2) like a MoviePy clip with set_start/set_end
+    return f"gte(t,{t1:.3f})*lt(t,{t2:.3f})"
+
+
+# ----------------------
+# RENDER WITH ONE FFMPEG CALL
+# ----------------------
+def render_with_ffmpeg(audio_file_path, timed_captions, segments, output_file,
+                       size, fps, preset, duration, threads=None, caption_style=None,
+                       extra_outputs=None):
+    """
+    Render the timeline with a single ffmpeg filtergraph:
+    per-segment trim + scale/crop, concat, caption PNG overlays, audio mux.
+    With audio_file_path=None a video-only file is written.
+
+    extra_outputs=[(output_file, filter), ...] splits the composited stream
+    and encodes each branch (after its filter) to its own file in the same
+    invocation; output_file may then be None.
+    """
+    input_args = []
+    filters = []
+    n_inputs = 0
+
+    # 1. background segments → concat
+    concat_labels = []
+    for i, seg in enumerate(segments):
+        if seg["type"] == "image":
+            # decode the (often 6000 px) original once, at reduced size
+            seg = dict(seg, path=fitted_still_path(seg["path"], size))
+        args = segment_input_args(seg, fps)
+        if args:
+            input_args += args
+            chain = segment_filter(f"{n_inputs}:v", seg, size, fps)
+            n_inputs += 1
+        else:
+            chain = segment_filter(None, seg, size, fps)
+        filters.append(f"{chain}[s{i}]")
+        concat_labels.append(f"[s{i}]")
+    filters.append(f"{''.join(concat_labels)}concat=n={len(concat_labels)}:v=1:a=0[base]")
+
+    # 2. caption overlays
+    last = "base"
+    for i, ((t1, t2), text) in enumerate(timed_captions):
+        input_args += ["-i", render_caption_png(text, **(caption_style or {}))]
+        filters.append(
+            f"[{last}][{n_inputs}:v]overlay=x=(W-w)/2:y=H-h:eof_action=repeat:"
+            f"enable='{caption_overlay_expr(t1, t2)}'[c{i}]"
+        )
+        last = f"c{i}"
+        n_inputs += 1
+
+    # 3. one or more encoded outputs
+    outputs = [(output_file, None)] if output_file else []
+    outputs += extra_outputs or []
+    if len(outputs) > 1:
+        filters.append(f"[{last}]split={len(outputs)}" + "".join(f"[o{k}]" for k in range(len(outputs))))
+    video_labels = []
+    for k, (_, branch_filter) in enumerate(outputs):
+        source = f"o{k}" if len(outputs) > 1 else last
+        if branch_filter:
+            filters.append(f"[{source}]{branch_filter}[v{k}]")
+            source = f"v{k}"
+        video_labels.append(source)
+
+    # 4. audio
+    audio_map = []
+    if audio_file_path:
+        input_args += ffmpeg_audio_input(audio_file_path)
+        audio_map = ["-map", f"{n_inputs}:a", "-c:a", "aac"]
+
+    output_args = []
+    for (path, _), label in zip(outputs, video_labels):
+        output_args += ["-map", f"[{label}]"] + (audio_map or ["-an"])
+        if threads:
+            output_args += ["-threads", threads]
+        output_args += [
+            "-c:v", "libx264",
+            "-preset", preset,
+            "-pix_fmt", "yuv420p",
+            "-r", fps,
+            "-t", f"{duration:.3f}",
+            path,
+        ]
+
+    run_ffmpeg(input_args + ["-filter_complex", ";".join(filters)] + output_args)
+    return output_file
@@ -0,0 +1,39 @@
+import subprocess
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+# ----------------------
+# FFMPEG BINARY (same one MoviePy uses)
+# ----------------------
+def get_ffmpeg_binary():
+    return get_setting("FFMPEG_BINARY")
+
+
+# ----------------------
+# RUN FFMPEG
+# ----------------------
+def run_ffmpeg(args):
+    """Run ffmpeg with args, raise RuntimeError with the stderr tail on failure."""
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + [str(a) for a in args]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        tail = proc.stderr.decode("utf-8", errors="replace").strip()[-2000:]
+        raise RuntimeError(f"ffmpeg failed (code {proc.returncode}): {tail}")
+
+
+# ----------------------
+# PROBE
+# ----------------------
+def probe_duration(path):
+    return ffmpeg_parse_infos(path)["duration"]
+
+
+def decoded_duration(path, sample_rate=16000):
+    """Exact length from a full decode to a pipe (container headers can be off for mp3); nothing is written."""
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", str(path), "-vn",
+           "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        tail = proc.stderr.decode("utf-8", errors="replace").strip()[-2000:]
+        raise RuntimeError(f"ffmpeg failed (code {proc.returncode}): {tail}")
+    return len(proc.stdout) / (2 * sample_rate)
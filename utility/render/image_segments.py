@@ -0,0 +1,68 @@
+import math
+import os
+import numpy as np
+from PIL import Image, ImageOps
+from utility import disk_cache
+
+# ----------------------
+# IMAGE SEGMENT CONFIG
+# ----------------------
+IMAGE_CACHE_NAMESPACE = "stills"
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+IMAGE_MOTION = os.environ.get("IMAGE_MOTION", "none")   # "none" | "zoom"
+ZOOM_END = 1.15
+
+
+# ----------------------
+# REDUCED-RESOLUTION DECODE
+# ----------------------
+def open_image_reduced(path, size):
+    """
+    Open an image decoded no larger than needed to cover size. For JPEGs
+    Pillow's draft mode makes libjpeg decode at 1/2, 1/4 or 1/8 scale, so a
+    6000 px Pexels original never exists in memory at full resolution.
+    """
+    img = Image.open(path)
+    w, h = size
+    iw, ih = img.size
+    scale = max(w / iw, h / ih)
+    if scale < 1:
+        img.draft("RGB", (math.ceil(iw * scale), math.ceil(ih * scale)))
+    img = ImageOps.exif_transpose(img)
+    return img.convert("RGB")
+
+
+def load_image_fitted(path, size):
+    """Image resized once (cover + center crop) to the output frame, as uint8 RGB."""
+    img = open_image_reduced(path, size)
+    fitted = ImageOps.fit(img, tuple(size), Image.LANCZOS, centering=(0.5, 0.5))
+    img.close()
+    return np.asarray(fitted)
+
+
+# ----------------------
+# CACHED FITTED STILL (input for proxies / ffmpeg)
+# ----------------------
+def fitted_still_path(path, size):
+    key = disk_cache.make_key("still", os.path.abspath(path), os.path.getsize(path), list(size))
+    cached = disk_cache.lookup(IMAGE_CACHE_NAMESPACE, key, ".png")
+    if cached:
+        return cached
+    with disk_cache.atomic_write(IMAGE_CACHE_NAMESPACE, key, ".png", IMAGE_CACHE_MAX_BYTES) as tmp_path:
+        Image.fromarray(load_image_fitted(path, size)).save(tmp_path, format="PNG")
+    return disk_cache.cache_path(IMAGE_CACHE_NAMESPACE, key, ".png")
+
+
+# ----------------------
+# MOTION (baked into pre-encoded image segments)
+# ----------------------
+def motion_filter(motion, nframes, size, fps):
+    """ffmpeg filter adding motion to a fitted still, or None for a static frame."""
+    if motion != "zoom":
+        return None
+    w, h = size
+    step = (ZOOM_END - 1) / max(1, nframes)
+    return (
+        f"zoompan=z='min(1+{step:.6f}*on,{ZOOM_END})':d={nframes}"
+        f":x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={w}x{h}:fps={fps}"
+    )
@@ -0,0 +1,100 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from utility.audio.audio_asset import ffmpeg_audio_input
+from utility.render.ffmpeg_utils import run_ffmpeg
+
+# ----------------------
+# OUTPUT PROFILES
+# ----------------------
+# size is the encoded frame; the composited master is cover-scaled and
+# cropped into it. anchor="bottom" keeps the caption band in crops that
+# lose height (e.g. square cuts of a 9:16 master).
+DEFAULT_OUTPUT_PROFILES = [
+    {"name": "1080x1920", "size": (1080, 1920), "output_file": "rendered_video_1080x1920.mp4"},
+    {"name": "720x1280", "size": (720, 1280), "output_file": "rendered_video_720x1280.mp4"},
+    {"name": "square", "size": (1080, 1080), "anchor": "bottom", "output_file": "rendered_video_square.mp4"},
+]
+
+
+def profile_filter(profile):
+    w, h = profile["size"]
+    y = "ih-oh" if profile.get("anchor") == "bottom" else "(ih-oh)/2"
+    return f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h}:(iw-ow)/2:{y},setsar=1"
+
+
+def output_report(profile, seconds):
+    path = profile["output_file"]
+    return {
+        "name": profile["name"],
+        "output_file": path,
+        "size": tuple(profile["size"]),
+        "seconds": round(seconds, 2),
+        "bytes": os.path.getsize(path) if os.path.exists(path) else None,
+    }
+
+
+# ----------------------
+# MOVIEPY: ONE COMPOSITE PASS → N ENCODERS
+# ----------------------
+def write_frame_nocopy(writer, frame):
+    try:
+        writer.proc.stdin.write(memoryview(frame).cast("B"))
+    except (IOError, BrokenPipeError):
+        # let moviepy build its detailed ffmpeg error message
+        writer.write_frame(frame)
+
+
+def write_multi_output(clip, audio_file_path, profiles, fps, preset, threads=None):
+    """
+    Iterate the composited clip once and feed every frame to one ffmpeg
+    encoder per profile; the encoders run as parallel processes. The audio is
+    encoded to AAC once and stream-copied into every output.
+    Returns one report per profile (own finish time and file size).
+    """
+    started = time.time()
+    audio_tmp = os.path.splitext(profiles[0]["output_file"])[0] + ".audio.m4a"
+    run_ffmpeg(ffmpeg_audio_input(audio_file_path) + ["-c:a", "aac", audio_tmp])
+
+    writers = []
+    try:
+        for profile in profiles:
+            # same size as the composite → no scale/crop filter at all
+            vf = [] if tuple(profile["size"]) == tuple(clip.size) else ["-vf", profile_filter(profile)]
+            writers.append(FFMPEG_VideoWriter(
+                profile["output_file"], clip.size, fps,
+                codec="libx264", preset=preset, audiofile=audio_tmp, threads=threads,
+                ffmpeg_params=vf + ["-shortest"]
+            ))
+
+        for frame in clip.iter_frames(fps=fps, dtype="uint8", logger="bar"):
+            frame = frame if frame.flags.c_contiguous else frame.copy()
+            for writer in writers:
+                write_frame_nocopy(writer, frame)
+
+        def finish(writer):
+            writer.close()
+            return time.time() - started
+
+        with ThreadPoolExecutor(max_workers=len(writers)) as executor:
+            seconds = list(executor.map(finish, writers))
+    finally:
+        for writer in writers:
+            if writer.proc:
+                writer.close()
+        if os.path.exists(audio_tmp):
+            os.remove(audio_tmp)
+
+    return [output_report(p, s) for p, s in zip(profiles, seconds)]
+
+
+def write_single_output(clip, audio_file_path, output_file, fps, preset, threads=None):
+    """
+    write_videofile replacement for one output: the same frame loop as
+    write_multi_output, so frames reach the encoder without the per-frame
+    tobytes() copy of FFMPEG_VideoWriter.write_frame.
+    """
+    profile = {"name": "final", "size": tuple(clip.size), "output_file": output_file}
+    write_multi_output(clip, audio_file_path, [profile], fps, preset, threads)
+    return output_file
@@ -0,0 +1,68 @@
+import os
+from utility import disk_cache
+from utility.render.ffmpeg_utils import run_ffmpeg
+from utility.render.ffmpeg_backend import frame_count, segment_input_args, segment_filter
+from utility.render.image_segments import IMAGE_MOTION, fitted_still_path, motion_filter
+
+# ----------------------
+# PROXY CONFIG
+# ----------------------
+PROXY_CACHE_NAMESPACE = "proxies"
+PROXY_CACHE_MAX_BYTES = int(os.environ.get("PROXY_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+PROXY_VERSION = 2
+
+# all-intra H.264: every frame is a keyframe, so seeks and decodes are cheap
+PROXY_CODEC_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "ultrafast",
+    "-tune", "fastdecode",
+    "-crf", "18",
+    "-g", "1",
+    "-pix_fmt", "yuv420p",
+]
+
+
+# ----------------------
+# MAKE PROXY
+# ----------------------
+def make_proxy(source_path, media_type, start, end, size, fps, motion=IMAGE_MOTION):
+    """
+    Convert a downloaded asset into a proxy for the [start, end) slot of
+    the timeline: cut to the slot length, scaled/cropped to size, resampled
+    to fps, no audio. The proxy plays from its first frame at `start`, so it
+    drops into the compositor in place of the original file.
+
+    Images are decoded at reduced resolution and fitted to size once (see
+    image_segments); `motion` is baked into their frames.
+    """
+    nframes = max(1, frame_count(start, end, fps))   # sliver slots are dropped from the timeline anyway
+    # asset cache files are content-addressed by URL and never rewritten
+    # in place, so path + size identifies the source (mtime is the LRU clock)
+    key = disk_cache.make_key(
+        PROXY_VERSION, os.path.abspath(source_path), os.path.getsize(source_path),
+        media_type, nframes, list(size), fps, motion if media_type == "image" else None
+    )
+    path = disk_cache.lookup(PROXY_CACHE_NAMESPACE, key, ".mp4")
+    if path:
+        return path
+
+    seg = {"start": start, "end": end, "offset": 0.0, "path": source_path, "type": media_type}
+    input_args = None
+    chain = None
+    if media_type == "image":
+        seg["path"] = fitted_still_path(source_path, size)
+        zoom = motion_filter(motion, nframes, size, fps)
+        if zoom:
+            input_args = ["-i", seg["path"]]
+            chain = f"[0:v]{zoom},setsar=1,format=yuv420p"
+
+    with disk_cache.atomic_write(PROXY_CACHE_NAMESPACE, key, ".mp4", PROXY_CACHE_MAX_BYTES) as tmp_path:
+        run_ffmpeg((input_args or segment_input_args(seg, fps)) + [
+            "-filter_complex", chain or segment_filter("0:v", seg, size, fps),
+            "-frames:v", nframes,
+            "-an",
+            *PROXY_CODEC_ARGS,
+            "-r", fps,
+            tmp_path,
+        ])
+    return disk_cache.cache_path(PROXY_CACHE_NAMESPACE, key, ".mp4")
@@ -1,128 +1,201 @@
 import time
-import os
-import tempfile
-import platform
-import subprocess
-from moviepy.editor import (
-    AudioFileClip, CompositeVideoClip, CompositeAudioClip, ImageClip,
-    TextClip, VideoFileClip
-)
+from utility import disk_cache
+from moviepy.editor import CompositeAudioClip
 from moviepy.audio.fx.audio_loop import audio_loop
 from moviepy.audio.fx.audio_normalize import audio_normalize
-import requests
+from utility.audio.audio_asset import MIX_PCM, audio_duration, narration_clip
+from utility.render.downloader import iter_downloads
+from utility.render.asset_cache import fetch_asset, get_asset_cache_stats
+from utility.render.caption_renderer import caption_style_for, get_caption_cache_info
+from utility.render.clips import make_caption_clip, make_media_clip
+from utility.render.compositor import BufferedCompositeVideoClip
+from utility.render.clip_pool import READER_POOL
+from utility.render.ffmpeg_backend import render_with_ffmpeg
+from utility.render.timeline import build_timeline
+from utility.render.proxy import make_proxy
+from utility.render.segment_renderer import render_segments_parallel
+from utility.render.multi_output import write_multi_output, write_single_output, output_report, profile_filter
 
 # ----------------------
-# DOWNLOAD FILE
+# RENDER CONFIG
 # ----------------------
-def download_file(url, filename):
-    with open(filename, 'wb') as f:
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
-        response = requests.get(url, headers=headers)
-        f.write(response.content)
+RENDER_BACKENDS = ("moviepy", "ffmpeg")
+OUTPUT_SIZE = (1080, 1920)   # output frame (9:16) for proxies and the ffmpeg backend
+OUTPUT_FPS = 25
+OUTPUT_PRESET = "veryfast"
+
+# preview keeps every cut point and caption time, only pixels/fps/encoder change
+RENDER_PROFILES = {
+    "final": {
+        "size": OUTPUT_SIZE,
+        "fps": OUTPUT_FPS,
+        "preset": OUTPUT_PRESET,
+        "max_asset_height": None,
+        "output_file": "rendered_video.mp4",
+    },
+    "preview": {
+        "size": (540, 960),
+        "fps": 15,
+        "preset": "ultrafast",
+        "max_asset_height": 960,   # lower-res Pexels renditions (see generate_video_url)
+        "output_file": "rendered_preview.mp4",
+    },
+}
 
 # ----------------------
-# FIND PROGRAM
+# SEGMENT MEDIA (DOWNLOAD + OPTIONAL PROXY)
 # ----------------------
-def search_program(program_name):
-    try: 
-        search_cmd = "where" if platform.system() == "Windows" else "which"
-        return subprocess.check_output([search_cmd, program_name]).decode().strip()
-    except subprocess.CalledProcessError:
-        return None
-
-def get_program_path(program_name):
-    return search_program(program_name)
+def fetch_segment_media(url, media_type, t1, t2, use_proxies, size=OUTPUT_SIZE, fps=OUTPUT_FPS):
+    """Local (path, media_type) for one segment; proxies are always video."""
+    path = fetch_asset(url, media_type)
+    if not use_proxies:
+        return path, media_type
+    return make_proxy(path, media_type, t1, t2, size, fps), 'video'
 
 # ----------------------
 # MAIN RENDER FUNCTION
 # ----------------------
-def get_output_media(audio_file_path, timed_captions, background_video_data, video_server=None):
-    OUTPUT_FILE_NAME = "rendered_video.mp4"
-
-    # Set ImageMagick path if exists
-    magick_path = get_program_path("magick")
-    if magick_path:
-        os.environ['IMAGEMAGICK_BINARY'] = magick_path
-    else:
-        os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/convert'
-
-    visual_clips = []
-    temp_files = []
-
-    # ----------------------
-    # HANDLE BACKGROUND VIDEO/IMAGE
-    # ----------------------
-    for item in background_video_data:
-        t1, t2 = item['time']
-        media_info = item['media']
-        video_url = media_info.get('url')
-        media_type = media_info.get('type', 'video')
-
-        if not video_url:
-            continue
-
-        # Download file
-        video_filename = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
-        download_file(video_url, video_filename)
-        temp_files.append(video_filename)
-
-        if media_type == 'video':
-            clip = VideoFileClip(video_filename)
-        elif media_type == 'image':
-            # convert image to video clip with duration
-            clip = ImageClip(video_filename, duration=t2 - t1)
-        else:
-            continue
-
-        clip = clip.set_start(t1).set_end(t2)
-        visual_clips.append(clip)
-
-    # ----------------------
-    # ADD AUDIO
-    # ----------------------
-    audio_clip = AudioFileClip(audio_file_path)
-    audio_clips = [audio_clip]
-
-    # ----------------------
-    # ADD TIMED CAPTIONS
-    # ----------------------
-    for (t1, t2), text in timed_captions:
-        text_clip = TextClip(
-            txt=text,
-            fontsize=40,             # chữ nhỏ hơn
-            color="white",
-            stroke_width=2,
-            stroke_color="black",
-            method="caption",        # wrap chữ đẹp hơn
-            size=(1280, None),       # giới hạn width để wrap chữ
-            align='center'
-        ).set_start(t1).set_end(t2).set_position(("center", "bottom"))
-        visual_clips.append(text_clip)
-
-    # ----------------------
-    # COMPOSITE VIDEO + AUDIO
-    # ----------------------
-    final_video = CompositeVideoClip(visual_clips)
-    final_video.audio = CompositeAudioClip(audio_clips)
-    final_video.duration = final_video.audio.duration
-
-    final_video.write_videofile(
-        OUTPUT_FILE_NAME,
-        codec='libx264',
-        audio_codec='aac',
-        fps=25,
-        preset='veryfast'
-    )
-
-    # ----------------------
-    # CLEAN UP TEMP FILES
-    # ----------------------
-    for f in temp_files:
-        try:
-            os.remove(f)
-        except:
-            pass
+def get_output_media(audio_file_path, timed_captions, background_video_data, video_server=None,
+                     backend="moviepy", use_proxies=True, parallel=False, workers=None,
+                     preview=False, incremental=True, output_profiles=None):
+    """
+    Render background media + captions + narration to rendered_video.mp4.
+
+    backend="moviepy" composites frames in Python (BufferedCompositeVideoClip);
+    backend="ffmpeg" renders the same timeline in a single ffmpeg filtergraph
+    at OUTPUT_SIZE, which is much faster on CPU.
+
+    use_proxies converts every asset into a pre-trimmed, OUTPUT_SIZE/OUTPUT_FPS
+    all-intra proxy first, so decode cost follows output pixels rather than
+    the (often 4K) source.
+
+    parallel=True splits the timeline at segment boundaries, renders the
+    chunks (with their captions, using the chosen backend) on `workers`
+    processes, joins them with stream copy and muxes the audio once.
+    Encoded chunks are cached by fingerprint, so with incremental=True a
+    re-render after a small edit only encodes the segments that changed.
+    incremental has no effect without parallel: the serial paths always
+    encode the whole timeline (app.py: --parallel).
+
+    preview=True renders RENDER_PROFILES["preview"] (reduced size and fps,
+    fastest preset, always through proxies) to rendered_preview.mp4 with the
+    same cut points and caption timing as the final render.
+
+    output_profiles=[{"name", "size", "output_file", "anchor"?}, ...] (see
+    multi_output.DEFAULT_OUTPUT_PROFILES) renders every profile from one
+    decode/composite pass with one encoder per profile, and returns a list
+    of {name, output_file, size, seconds, bytes} reports instead of a path.
+    """
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend '{backend}', expected one of {RENDER_BACKENDS}")
+
+    profile = RENDER_PROFILES["preview" if preview else "final"]
+    size, fps, preset = profile["size"], profile["fps"], profile["preset"]
+    caption_style = caption_style_for(size)
+    if preview:
+        use_proxies = True
+    if output_profiles and parallel:
+        raise ValueError("output_profiles cannot be combined with parallel=True")
+
+    OUTPUT_FILE_NAME = profile["output_file"]
+
+    # every asset/proxy path stays leased until the render is done, so other
+    # processes' cache writes cannot evict a file a reader has not opened yet
+    with disk_cache.leased() as leased_paths:
+        visual_clips = []
+
+        # ----------------------
+        # HANDLE BACKGROUND VIDEO/IMAGE
+        # ----------------------
+        jobs = []
+        for idx, item in enumerate(background_video_data):
+            media_info = item['media'] or {}
+            video_url = media_info.get('url')
+            media_type = media_info.get('type', 'video')
+
+            if not video_url or media_type not in ('video', 'image'):
+                continue
+
+            t1, t2 = item['time']
+            jobs.append((idx, (video_url, media_type, t1, t2, use_proxies, size, fps)))
+
+        # Fetch (+ proxy) all segments in parallel, build each clip as soon as it lands
+        media_files = {}
+        clips_by_index = {}
+        for idx, result, error in iter_downloads(jobs, fetch=fetch_segment_media):
+            if error:
+                print(f"Skip segment {idx}: {error}")
+                continue
+
+            media_files[idx] = result
+            leased_paths.add(result[0])
+            if backend == "moviepy" and not parallel:
+                t1, t2 = background_video_data[idx]['time']
+                clips_by_index[idx] = make_media_clip(result[0], result[1], t1, t2, size=size)
+
+        # keep timeline order (without proxies the first clip decides the output size)
+        visual_clips.extend(clips_by_index[idx] for idx in sorted(clips_by_index))
+        print(f"Asset cache: {get_asset_cache_stats()}")
+
+        if parallel or backend == "ffmpeg":
+            duration = audio_duration(audio_file_path, MIX_PCM)   # PCM the mux reads anyway
+            segments = build_timeline(background_video_data, media_files, duration, fps)
+
+        if parallel:
+            return render_segments_parallel(
+                audio_file_path, timed_captions, segments, OUTPUT_FILE_NAME,
+                size=size, fps=fps, preset=preset, duration=duration,
+                backend=backend, workers=workers, incremental=incremental
+            )
+
+        if backend == "ffmpeg" and output_profiles:
+            started = time.time()
+            render_with_ffmpeg(
+                audio_file_path, timed_captions, segments, None,
+                size=size, fps=fps, preset=preset, duration=duration, caption_style=caption_style,
+                extra_outputs=[(p["output_file"], profile_filter(p)) for p in output_profiles]
+            )
+            # one ffmpeg process encodes every output, so they share the wall time
+            return [output_report(p, time.time() - started) for p in output_profiles]
+
+        if backend == "ffmpeg":
+            return render_with_ffmpeg(
+                audio_file_path, timed_captions, segments, OUTPUT_FILE_NAME,
+                size=size, fps=fps, preset=preset, duration=duration, caption_style=caption_style
+            )
+
+        # ----------------------
+        # ADD AUDIO
+        # ----------------------
+        # narration decoded once, shared with captions (utility/audio/audio_asset.py)
+        audio_clip = narration_clip(audio_file_path)
+        audio_clips = [audio_clip]
+
+        # ----------------------
+        # ADD TIMED CAPTIONS
+        # ----------------------
+        for (t1, t2), text in timed_captions:
+            visual_clips.append(make_caption_clip(text, t1, t2, caption_style))
+        print(f"Caption cache: {get_caption_cache_info()}")
+
+        # ----------------------
+        # COMPOSITE VIDEO + AUDIO
+        # ----------------------
+        final_video = BufferedCompositeVideoClip(visual_clips, size=size if use_proxies else None)
+        final_video.audio = CompositeAudioClip(audio_clips)
+        final_video.duration = final_video.audio.duration
 
-    return OUTPUT_FILE_NAME
+        try:
+            if output_profiles:
+                return write_multi_output(final_video, audio_file_path, output_profiles, fps, preset)
+
+            # one writer loop without per-frame copies (same as the multi-output path)
+            write_single_output(final_video, audio_file_path, OUTPUT_FILE_NAME, fps, preset)
+        finally:
+            # đóng reader ffmpeg của từng clip, kể cả khi render lỗi
+            print(f"Reader pool: {READER_POOL.stats()}")
+            final_video.close()
+            audio_clip.close()
+            READER_POOL.close_all()
+
+        return OUTPUT_FILE_NAME
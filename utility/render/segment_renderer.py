@@ -0,0 +1,189 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from utility import disk_cache
+from utility.audio.audio_asset import ffmpeg_audio_input
+from utility.render.caption_renderer import caption_style_for, resolved_caption_style
+from utility.render.clips import make_caption_clip, make_segment_clip
+from utility.render.compositor import BufferedCompositeVideoClip
+from utility.render.ffmpeg_backend import frame_count, render_with_ffmpeg
+from utility.render.ffmpeg_utils import run_ffmpeg
+
+# ----------------------
+# SEGMENT CACHE CONFIG
+# ----------------------
+SEGMENT_CACHE_NAMESPACE = "segments"
+SEGMENT_CACHE_MAX_BYTES = int(os.environ.get("SEGMENT_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+SEGMENT_VERSION = 1
+
+# ----------------------
+# SPLIT TIMELINE INTO CHUNKS
+# ----------------------
+def captions_for_chunk(timed_captions, start, end):
+    """Captions overlapping [start, end), shifted to chunk-local time."""
+    local = []
+    for (t1, t2), text in timed_captions:
+        if t2 <= start or t1 >= end:
+            continue
+        local.append(((max(t1, start) - start, min(t2, end) - start), text))
+    return local
+
+
+def make_chunk_jobs(timed_captions, segments, size, fps, preset, backend, threads):
+    """
+    One job per timeline segment. Chunk boundaries sit on the global frame
+    grid, and every chunk is an independent encode that starts on a
+    keyframe, so the chunks can be joined with stream copy.
+    """
+    jobs = []
+    for i, seg in enumerate(segments):
+        nframes = frame_count(seg["start"], seg["end"], fps)
+        jobs.append({
+            "index": i,
+            "segment": seg,
+            "captions": captions_for_chunk(timed_captions, seg["start"], seg["end"]),
+            "nframes": nframes,
+            "size": size,
+            "fps": fps,
+            "preset": preset,
+            "backend": backend,
+            "threads": threads,
+            "caption_style": caption_style_for(size),
+        })
+    return jobs
+
+
+# ----------------------
+# FINGERPRINT (what the chunk's pixels depend on)
+# ----------------------
+def chunk_fingerprint(job):
+    seg = job["segment"]
+    return disk_cache.make_key(
+        SEGMENT_VERSION,
+        seg["source"],
+        os.path.basename(seg["path"]) if seg["path"] else None,
+        seg["type"],
+        round(seg["offset"], 3),
+        round(seg["start"], 3),
+        round(seg["end"], 3),
+        job["nframes"],
+        [[list(t), text] for t, text in job["captions"]],
+        list(job["size"]),
+        job["fps"],
+        job["preset"],
+        job["backend"],
+        resolved_caption_style(job["caption_style"]),
+    )
+
+
+# ----------------------
+# RENDER ONE CHUNK (runs in a worker process)
+# ----------------------
+def render_chunk(job, output_file):
+    seg = job["segment"]
+    fps = job["fps"]
+    duration = job["nframes"] / fps
+    # local slot of exactly nframes, whatever the global rounding was
+    local_seg = dict(seg, start=0.0, end=duration)
+
+    if job["backend"] == "ffmpeg":
+        render_with_ffmpeg(
+            None, job["captions"], [local_seg], output_file,
+            size=job["size"], fps=fps, preset=job["preset"], duration=duration,
+            threads=job["threads"], caption_style=job["caption_style"]
+        )
+        return output_file
+
+    clips = [make_segment_clip(local_seg, job["size"])]
+    clips += [make_caption_clip(text, t1, t2, job["caption_style"])
+              for (t1, t2), text in job["captions"]]
+    chunk = BufferedCompositeVideoClip(clips, size=job["size"])
+    # half a frame short so MoviePy's frame loop emits exactly nframes
+    chunk = chunk.set_duration((job["nframes"] - 0.5) / fps)
+    try:
+        chunk.write_videofile(
+            output_file,
+            codec='libx264',
+            audio=False,
+            fps=fps,
+            preset=job["preset"],
+            threads=job["threads"],
+            logger=None
+        )
+    finally:
+        chunk.close()
+    return output_file
+
+
+# ----------------------
+# CONCAT (STREAM COPY) + AUDIO MUX
+# ----------------------
+def concat_chunks(chunk_files, audio_file_path, output_file, duration):
+    list_file = output_file + ".concat.txt"
+    with open(list_file, "w") as f:
+        for path in chunk_files:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            *ffmpeg_audio_input(audio_file_path),
+            "-map", "0:v", "-map", "1:a",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-t", f"{duration:.3f}",
+            output_file,
+        ])
+    finally:
+        os.remove(list_file)
+    return output_file
+
+
+# ----------------------
+# PARALLEL RENDER
+# ----------------------
+def render_segments_parallel(audio_file_path, timed_captions, segments, output_file,
+                             size, fps, preset, duration, backend="moviepy", workers=None,
+                             incremental=True):
+    """
+    Render each timeline segment with its captions in a process pool, join
+    the chunks losslessly and mux the narration once at the end.
+
+    Encoded chunks are kept in the segment cache under their fingerprint
+    (media URL, time range, overlapping captions, render settings), so with
+    incremental=True a re-render only encodes the segments that changed.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    jobs = make_chunk_jobs(timed_captions, segments, size, fps, preset, backend, threads)
+
+    # chunks reused or committed early must survive this run's later commits
+    with disk_cache.leased() as leased_paths:
+        chunk_files = []
+        pending = []   # (position, job, fingerprint, temp path)
+        for position, job in enumerate(jobs):
+            fingerprint = chunk_fingerprint(job)
+            cached = disk_cache.lookup(SEGMENT_CACHE_NAMESPACE, fingerprint, ".mp4") if incremental else None
+            if cached:
+                leased_paths.add(cached)
+                chunk_files.append(cached)
+                continue
+            tmp_path = disk_cache.reserve_temp(SEGMENT_CACHE_NAMESPACE, ".mp4")
+            pending.append((position, job, fingerprint, tmp_path))
+            chunk_files.append(None)
+        print(f"Segments: {len(jobs) - len(pending)} reused, {len(pending)} to render")
+
+        try:
+            if pending:
+                with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+                    list(executor.map(render_chunk, [p[1] for p in pending], [p[3] for p in pending]))
+            for position, _, fingerprint, tmp_path in pending:
+                chunk_files[position] = disk_cache.commit(
+                    SEGMENT_CACHE_NAMESPACE, fingerprint, tmp_path, ".mp4", SEGMENT_CACHE_MAX_BYTES
+                )
+                leased_paths.add(chunk_files[position])
+        finally:
+            for _, _, _, tmp_path in pending:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return concat_chunks(chunk_files, audio_file_path, output_file, duration)
@@ -0,0 +1,66 @@
+# ----------------------
+# FRAME GRID
+# ----------------------
+def frame_count(start, end, fps):
+    """
+    Frames of [start, end) on the global frame grid, so cuts never drift:
+    the counts of back-to-back segments always add up to round(end * fps).
+    Can be 0 for a sliver shorter than one frame.
+    """
+    return round(end * fps) - round(start * fps)
+
+
+# ----------------------
+# TIMELINE
+# ----------------------
+def gap_segment(start, end):
+    return {"start": start, "end": end, "offset": 0.0, "path": None, "type": "gap",
+            "index": None, "source": None}
+
+
+def build_timeline(background_video_data, media_files, duration, fps):
+    """
+    Turn the timed media list into back-to-back segments covering
+    [0, duration]:
+
+        [{"start": 0.0, "end": 3.2, "offset": 0.0, "path": "...", "type": "video", "index": 0},
+         {"start": 3.2, "end": 4.0, "offset": 0.0, "path": None, "type": "gap", "index": None}, ...]
+
+    media_files maps an index of background_video_data to the local
+    (path, media_type) used for it. offset is where the segment starts
+    inside that file, source the remote URL it came from.
+
+    Segments without a local file and the holes between them become black
+    "gap" segments, which is what the MoviePy composite shows there.
+    Overlaps are resolved in favour of the later segment's start. Segments
+    that get no frame on the fps grid are dropped, so the frame counts of
+    what is left add up to exactly round(duration * fps).
+    """
+    timed = []
+    for idx, item in enumerate(background_video_data):
+        if idx not in media_files:
+            continue
+        path, media_type = media_files[idx]
+        t1, t2 = float(item['time'][0]), float(item['time'][1])
+        timed.append((t1, t2, idx, path, media_type, item['media'].get('url')))
+    timed.sort(key=lambda x: (x[0], x[2]))
+
+    segments = []
+    cursor = 0.0
+    for i, (t1, t2, idx, path, media_type, source) in enumerate(timed):
+        start = max(t1, cursor)
+        end = min(t2, duration)
+        if i + 1 < len(timed):
+            end = min(end, timed[i + 1][0])
+        if frame_count(start, end, fps) <= 0:
+            continue
+        if frame_count(cursor, start, fps) > 0:
+            segments.append(gap_segment(cursor, start))
+        segments.append({"start": start, "end": end, "offset": start - t1,
+                         "path": path, "type": media_type, "index": idx, "source": source})
+        cursor = end
+
+    if frame_count(cursor, duration, fps) > 0:
+        segments.append(gap_segment(cursor, duration))
+
+    return segments
@@ -4,7 +4,9 @@
 import os
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from utility.utils import log_response, LOG_TYPE_PEXEL
+from utility.video.search_cache import cached_search, get_search_cache_stats
 
 # ================================
 # PEXELS CONFIG
@@ -12,6 +14,7 @@ from utility.utils import log_response, LOG_TYPE_PEXEL
 PEXELS_API_KEY = os.environ.get("PEXELS_KEY")
 if not PEXELS_API_KEY:
     raise RuntimeError("Missing PEXELS_KEY environment variable")
+PEXELS_WORKERS = int(os.environ.get("PEXELS_WORKERS", 8))
 
 
 # ================================
@@ -58,13 +61,15 @@ def pexels_video_search(query):
         "per_page": 30
     }
 
-    r = safe_request(url, headers, params)
-    if not r:
-        return None
+    def fetch():
+        r = safe_request(url, headers, params)
+        if not r:
+            return None
+        data = r.json()
+        log_response(LOG_TYPE_PEXEL, query, data)
+        return data
 
-    data = r.json()
-    log_response(LOG_TYPE_PEXEL, query, data)
-    return data
+    return cached_search(url, query, params, fetch)
 
 
 # ================================
@@ -80,133 +85,162 @@ def pexels_image_search(query):
         "size": "large"
     }
 
-    r = safe_request(url, headers, params)
-    if not r:
-        return None
+    def fetch():
+        r = safe_request(url, headers, params)
+        if not r:
+            return None
+        data = r.json()
+        log_response(LOG_TYPE_PEXEL, query, data)
+        return data
 
-    data = r.json()
-    log_response(LOG_TYPE_PEXEL, query, data)
-    return data
+    return cached_search(url, query, params, fetch)
 
 
 # ================================
-# GET BEST VIDEO (QUALITY FIRST)
+# RANK CANDIDATES (chưa lọc used)
 # ================================
-def getBestVideo(query_list, used=None, target_duration=5):
-    if used is None:
-        used = set()
-    else:
-        used = set(used)
+def video_candidates(data, target_duration=5):
+    if not data or "videos" not in data:
+        return []
+
+    candidates = []
+    for v in data["videos"]:
+        duration = int(v.get("duration", 0))
+        for f in v.get("video_files", []):
+            w, h = f.get("width"), f.get("height")
+            if not is_tiktok_ratio(w, h):
+                continue
+            link = f.get("link")
+            if not link:
+                continue
+            base = link.split("?")[0]
+            candidates.append({
+                "id": v.get("id") or base,
+                "link": link,
+                "base": base,
+                "height": h or 0,
+                "pixels": (w or 0) * (h or 0),
+                "fps": f.get("fps", 0),
+                "size": f.get("file_size", 0),
+                "duration_diff": abs(duration - target_duration)
+            })
 
-    if not isinstance(query_list, list):
-        query_list = [query_list]
+    # SORT: chất lượng cao nhất, fps, size, duration
+    candidates.sort(
+        key=lambda x: (
+            -x["pixels"],
+            -x["size"],
+            -x["fps"],
+            x["duration_diff"]
+        )
+    )
+    return candidates
 
-    for query in query_list:
-        data = pexels_video_search(query)
-        if not data or "videos" not in data:
-            continue
 
-        candidates = []
-        for v in data["videos"]:
-            duration = int(v.get("duration", 0))
-            for f in v.get("video_files", []):
-                w, h = f.get("width"), f.get("height")
-                if not is_tiktok_ratio(w, h):
-                    continue
-                link = f.get("link")
-                if not link:
-                    continue
-                base = link.split("?")[0]
-                if base in used:
-                    continue
-                candidates.append({
-                    "link": link,
-                    "base": base,
-                    "pixels": (w or 0) * (h or 0),
-                    "fps": f.get("fps", 0),
-                    "size": f.get("file_size", 0),
-                    "duration_diff": abs(duration - target_duration)
-                })
-
-        if not candidates:
+def pick_video(candidates, used, max_height=None):
+    """
+    Video xếp hạng cao nhất chưa có trong `used` (theo id video Pexels).
+    Preview (max_height) vẫn chọn đúng video đó như bản render cuối, chỉ
+    lấy rendition lớn nhất có chiều cao <= max_height của chính video ấy.
+    """
+    best = next((c for c in candidates if c["id"] not in used), None)
+    if best is None:
+        return None
+
+    if max_height:
+        small = [c for c in candidates if c["id"] == best["id"] and c["height"] <= max_height]
+        if small:
+            best = small[0]
+
+    used.add(best["id"])
+    return {
+        "type": "video",
+        "url": best["link"],
+        "resolution": f"{int((best['pixels']**0.5))}x{int((best['pixels']**0.5*16/9))}"
+    }
+
+
+def image_candidates(data, max_height=None):
+    if not data or "photos" not in data:
+        return []
+
+    candidates = []
+    for p in data["photos"]:
+        src = p.get("src", {})
+        if max_height:
+            url = src.get("large2x") or src.get("original")  # preview: bản nhỏ hơn
+        else:
+            url = src.get("original")  # max quality
+        if not url:
             continue
+        w = p.get("width", 0)
+        h = p.get("height", 0)
+        candidates.append({
+            "url": url,
+            "base": url.split("?")[0],
+            "pixels": w * h,
+            "width": w,
+            "height": h
+        })
 
-        # SORT: chất lượng cao nhất, fps, size, duration
-        candidates.sort(
-            key=lambda x: (
-                -x["pixels"],
-                -x["size"],
-                -x["fps"],
-                x["duration_diff"]
-            )
+    # sort theo độ phân giải + ưu tiên dọc
+    candidates.sort(
+        key=lambda x: (
+            -x["pixels"],
+            -x["height"],
+            -x["width"]
         )
+    )
+    return candidates
+
 
-        best = candidates[0]
+def pick_image(candidates, used):
+    for best in candidates:
+        if best["base"] in used:
+            continue
         used.add(best["base"])
         return {
-            "type": "video",
-            "url": best["link"],
-            "resolution": f"{int((best['pixels']**0.5))}x{int((best['pixels']**0.5*16/9))}"
+            "type": "image",
+            "url": best["url"],
+            "resolution": f"{best['width']}x{best['height']}"
         }
-
     return None
 
 
 # ================================
-# GET BEST IMAGE (ULTRA QUALITY)
+# GET BEST VIDEO (QUALITY FIRST)
 # ================================
-def getUltraQualityImage(query_list, used=None):
+def getBestVideo(query_list, used=None, target_duration=5, max_height=None):
+    """Video tốt nhất chưa có trong `used`; link chọn được thêm thẳng vào `used`."""
     if used is None:
         used = set()
-    else:
-        used = set(used)
 
     if not isinstance(query_list, list):
         query_list = [query_list]
 
     for query in query_list:
-        data = pexels_image_search(query)
-        if not data or "photos" not in data:
-            continue
+        media = pick_video(video_candidates(pexels_video_search(query), target_duration), used, max_height)
+        if media:
+            return media
 
-        candidates = []
-        for p in data["photos"]:
-            src = p.get("src", {})
-            url = src.get("original")  # max quality
-            if not url:
-                continue
-            base = url.split("?")[0]
-            if base in used:
-                continue
-            w = p.get("width", 0)
-            h = p.get("height", 0)
-            candidates.append({
-                "url": url,
-                "base": base,
-                "pixels": w * h,
-                "width": w,
-                "height": h
-            })
+    return None
 
-        if not candidates:
-            continue
 
-        # sort theo độ phân giải + ưu tiên dọc
-        candidates.sort(
-            key=lambda x: (
-                -x["pixels"],
-                -x["height"],
-                -x["width"]
-            )
-        )
+# ================================
+# GET BEST IMAGE (ULTRA QUALITY)
+# ================================
+def getUltraQualityImage(query_list, used=None, max_height=None):
+    """Ảnh tốt nhất chưa có trong `used`; link chọn được thêm thẳng vào `used`."""
+    if used is None:
+        used = set()
 
-        best = candidates[0]
-        used.add(best["base"])
-        return {
-            "type": "image",
-            "url": best["url"],
-            "resolution": f"{best['width']}x{best['height']}"
-        }
+    if not isinstance(query_list, list):
+        query_list = [query_list]
+
+    for query in query_list:
+        media = pick_image(image_candidates(pexels_image_search(query), max_height), used)
+        if media:
+            return media
 
     return None
 
@@ -214,34 +248,78 @@ def getUltraQualityImage(query_list, used=None):
 # ================================
 # FINAL MEDIA GENERATOR
 # ================================
-def generate_video_url(timed_video_searches):
+SEARCHES = {
+    "video": pexels_video_search,
+    "image": pexels_image_search,
+}
+
+
+def segment_stages(keywords):
+    """Thứ tự tra cứu của một segment: video theo từng keyword, rồi ảnh."""
+    if not isinstance(keywords, list):
+        keywords = [keywords]
+    return [("video", q) for q in keywords] + [("image", q) for q in keywords]
+
+
+def select_media(segments, fetched, max_height=None):
+    """
+    Deterministic selection over the searches fetched so far, in segment
+    order, exactly as the serial loop would pick. Returns (picks, missing):
+    missing are the (kind, query) searches some segment needs next; picks
+    after a segment that is still waiting are provisional.
+    """
+    used = set()
+    picks, missing = [], []
+    for stages, duration in segments:
+        media = None
+        for stage in stages:
+            if stage not in fetched:
+                missing.append(stage)
+                break
+            data = fetched[stage]
+            if stage[0] == "video":
+                media = pick_video(video_candidates(data, duration), used, max_height)
+            else:
+                media = pick_image(image_candidates(data, max_height), used)
+            if media:
+                break
+        picks.append(media)
+    return picks, list(dict.fromkeys(missing))
+
+
+def generate_video_url(timed_video_searches, max_height=None, workers=PEXELS_WORKERS):
     """
     timed_video_searches = [
         {"start": 0, "end": 3.3, "keywords": ["space", "universe"]},
         ...
     ]
-    """
-
-    results = []
-    used_assets = set()
+    max_height: chọn bản video/ảnh nhỏ hơn (preview render)
 
+    Tra cứu Pexels song song theo từng vòng (mỗi query chỉ gọi một lần);
+    việc chọn + loại trùng chạy lại từ đầu theo thứ tự segment sau mỗi vòng,
+    nên kết quả giống hệt chạy tuần tự, không phụ thuộc thứ tự request xong.
+    """
+    segments = []
     for item in timed_video_searches:
         t1 = float(item.get("start", 0))
         t2 = float(item.get("end", 0))
-        keywords = item.get("keywords", [])
-
-        duration = max(1.0, t2 - t1)
-
-        # 1️⃣ Try high-quality video
-        media = getBestVideo(keywords, used=used_assets, target_duration=duration)
-
-        # 2️⃣ Fallback → Ultra quality image
-        if not media:
-            media = getUltraQualityImage(keywords, used=used_assets)
-
-        results.append({
-            "time": [t1, t2],
-            "media": media
-        })
-
-    return results
+        segments.append((segment_stages(item.get("keywords", [])), max(1.0, t2 - t1)))
+
+    fetched = {}
+    rounds = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            picks, missing = select_media(segments, fetched, max_height)
+            if not missing:
+                break
+            # vòng đầu: query đầu tiên của mọi segment cùng lúc
+            rounds += 1
+            for stage, data in zip(missing, executor.map(lambda st: SEARCHES[st[0]](st[1]), missing)):
+                fetched[stage] = data
+    print(f"Pexels: {len(fetched)} searches in {rounds} rounds for {len(segments)} segments "
+          f"(search cache: {get_search_cache_stats()})")
+
+    return [
+        {"time": [float(item.get("start", 0)), float(item.get("end", 0))], "media": media}
+        for item, media in zip(timed_video_searches, picks)
+    ]
@@ -0,0 +1,144 @@
+# =========================================
+#   PEXELS SEARCH CACHE (SQLITE + TTL)
+# =========================================
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from utility import disk_cache
+
+# ================================
+# CONFIG
+# ================================
+SEARCH_CACHE_DB = os.environ.get(
+    "PEXELS_CACHE_DB", os.path.join(disk_cache.CACHE_ROOT, "pexels_search.sqlite3")
+)
+SEARCH_CACHE_TTL = float(os.environ.get("PEXELS_CACHE_TTL", 7 * 86400))      # còn "tươi"
+SEARCH_CACHE_STALE = float(os.environ.get("PEXELS_CACHE_STALE", 30 * 86400))  # dùng tạm + làm mới nền
+SEARCH_CACHE_VERSION = 1
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+_local = threading.local()
+_memo = {}                   # key → response, trong một process
+_memo_lock = threading.Lock()
+_revalidating = set()
+_stats = {"memo_hits": 0, "fresh_hits": 0, "stale_hits": 0, "misses": 0, "revalidations": 0}
+
+
+# ================================
+# KEY
+# ================================
+def normalize_query(query):
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", query)).strip().lower()
+
+
+def search_key(endpoint, query, params):
+    params = {k: v for k, v in (params or {}).items() if k != "query"}
+    return disk_cache.make_key("pexels", SEARCH_CACHE_VERSION, endpoint, normalize_query(query), params)
+
+
+# ================================
+# SQLITE (một connection mỗi thread)
+# ================================
+def _db():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(SEARCH_CACHE_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(SEARCH_CACHE_DB, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS search ("
+            " key TEXT PRIMARY KEY, endpoint TEXT, query TEXT,"
+            " response TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        conn.execute("DELETE FROM search WHERE fetched_at < ?", (time.time() - SEARCH_CACHE_STALE,))
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def _load(key):
+    row = _db().execute("SELECT response, fetched_at FROM search WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None, None
+    return json.loads(row[0]), row[1]
+
+
+def _store(key, endpoint, query, response):
+    conn = _db()
+    conn.execute(
+        "INSERT OR REPLACE INTO search (key, endpoint, query, response, fetched_at) VALUES (?, ?, ?, ?, ?)",
+        (key, endpoint, normalize_query(query), json.dumps(response, ensure_ascii=False), time.time()),
+    )
+    conn.commit()
+
+
+def _count(field):
+    with _memo_lock:
+        _stats[field] += 1
+
+
+# ================================
+# LOOKUP
+# ================================
+def _revalidate(key, endpoint, query, fetch):
+    try:
+        response = fetch()
+        if response is not None:
+            _store(key, endpoint, query, response)
+            with _memo_lock:
+                _memo[key] = response
+    finally:
+        with _memo_lock:
+            _revalidating.discard(key)
+
+
+def cached_search(endpoint, query, params, fetch):
+    """
+    Pexels response for (endpoint, normalized query, params). fetch() → dict
+    or None does the real API call and only runs when needed:
+
+    - in-process memo: repeated queries in one run never touch SQLite;
+    - fresh (< PEXELS_CACHE_TTL): served from SQLite;
+    - stale (< PEXELS_CACHE_STALE): served at once, refreshed in a background thread;
+    - older / missing: fetched now. A failed fetch falls back to any stale copy.
+    """
+    key = search_key(endpoint, query, params)
+    with _memo_lock:
+        if key in _memo:
+            _stats["memo_hits"] += 1
+            return _memo[key]
+
+    response, fetched_at = _load(key)
+    age = time.time() - fetched_at if fetched_at is not None else None
+
+    if age is not None and age < SEARCH_CACHE_TTL:
+        _count("fresh_hits")
+    elif age is not None and age < SEARCH_CACHE_STALE:
+        _count("stale_hits")
+        with _memo_lock:
+            start = key not in _revalidating
+            _revalidating.add(key)
+        if start:
+            _count("revalidations")
+            threading.Thread(target=_revalidate, args=(key, endpoint, query, fetch), daemon=True).start()
+    else:
+        _count("misses")
+        fresh = fetch()
+        if fresh is None:
+            return response          # API lỗi → dùng bản cũ nếu có
+        _store(key, endpoint, query, fresh)
+        response = fresh
+
+    with _memo_lock:
+        _memo[key] = response
+    return response
+
+
+def get_search_cache_stats():
+    with _memo_lock:
+        return dict(_stats)